@@ -0,0 +1,362 @@
+"""Headless HTTP API over the chat, summary and image tools.
+
+    uvicorn api:app --workers 4
+
+Needs fastapi and uvicorn, which the Streamlit app does not. Every worker
+keeps its state in the shared SQLite database (sessions, jobs, chats), so
+any worker can serve any request, including polling a job started by
+another one.
+"""
+import os
+import re
+import secrets
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from auth import create_user, login_user, save_chat, list_conversations, load_messages, chat_owner
+from db import db
+from image_store import image_store, image_ref, image_id_from_path
+from metrics import render_prometheus
+from model_health import model_health
+from utils import chat_with_llm, chat_with_llm_stream, summarize_youtube, summarize_pdf, generate_image, extract_video_id, SUMMARY_LANGUAGES, FAILURE_PREFIXES
+
+API_SESSION_TTL_SECONDS = int(os.getenv("API_SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+API_JOB_WORKERS = int(os.getenv("API_JOB_WORKERS", "4"))
+API_MAX_PDF_BYTES = int(os.getenv("API_MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+API_HISTORY_LIMIT = 200
+
+SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful, friendly AI assistant."}
+
+
+# =========================
+# SESSIONS
+# =========================
+class SessionStore:
+    def __init__(self, database=db, ttl=API_SESSION_TTL_SECONDS):
+        self.db = database
+        self.ttl = ttl
+
+    def create(self, username):
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO api_sessions (token, username, expires_at) VALUES (?, ?, ?)",
+                (token, username, now + self.ttl)
+            )
+            conn.execute("DELETE FROM api_sessions WHERE expires_at<=?", (now,))
+        return token
+
+    def username(self, token):
+        row = self.db.fetchone(
+            "SELECT username FROM api_sessions WHERE token=? AND expires_at>?",
+            (token, time.time())
+        )
+        return row[0] if row else None
+
+    def delete(self, token):
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM api_sessions WHERE token=?", (token,))
+
+
+# =========================
+# BACKGROUND JOBS
+# =========================
+class JobStore:
+    """Job status in SQLite, so it can be polled from any worker process.
+
+    Jobs run on a thread pool in the process that accepted them. A job whose
+    process died stays "running"; clients should give up after a timeout.
+    """
+
+    def __init__(self, database=db, max_workers=API_JOB_WORKERS):
+        self.db = database
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-job")
+
+    def _set(self, job_id, status, result=None, error=None):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE api_jobs SET status=?, result=?, error=?, updated_at=? WHERE job_id=?",
+                (status, result, error, time.time(), job_id)
+            )
+
+    def submit(self, username, kind, fn, *args):
+        """Queue `fn(*args)` and return its job id. `fn` returns the result text."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO api_jobs (job_id, username, kind, status, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', ?, ?)
+                """,
+                (job_id, username, kind, now, now)
+            )
+
+        def run():
+            self._set(job_id, "running")
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self._set(job_id, "failed", error=str(e))
+                return
+            self._set(job_id, "done", result=result)
+
+        self._pool.submit(run)
+        return job_id
+
+    def get(self, job_id):
+        row = self.db.fetchone(
+            """
+            SELECT job_id, username, kind, status, result, error, created_at, updated_at
+            FROM api_jobs WHERE job_id=?
+            """,
+            (job_id,)
+        )
+        if row is None:
+            return None
+        keys = ("job_id", "username", "kind", "status", "result", "error", "created_at", "updated_at")
+        return dict(zip(keys, row))
+
+
+sessions = SessionStore()
+jobs = JobStore()
+app = FastAPI(title="AI Chatbot API")
+
+
+# =========================
+# REQUEST BODIES
+# =========================
+class Credentials(BaseModel):
+    username: str
+    password: str
+
+
+class ChatRequest(BaseModel):
+    message: str
+    chat_id: Optional[str] = None
+    stream: bool = True
+
+
+class YouTubeRequest(BaseModel):
+    url: str
+    language: str = "English"
+    chat_id: Optional[str] = None
+
+
+class ImageRequest(BaseModel):
+    prompt: str
+    chat_id: Optional[str] = None
+
+
+# =========================
+# AUTH
+# =========================
+def current_user(authorization: str = Header(None)):
+    token = (authorization or "").removeprefix("Bearer ").strip()
+    username = sessions.username(token) if token else None
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return username
+
+
+def _summary_language(language):
+    if language not in SUMMARY_LANGUAGES:
+        raise HTTPException(
+            status_code=422, detail=f"language must be one of: {', '.join(SUMMARY_LANGUAGES)}"
+        )
+    return language
+
+
+def _owned_chat(chat_id, username):
+    # None (a new chat) and chats with no saved message yet are fine. Blocks
+    # (a query, and a write-behind flush), so endpoints run it on the pool.
+    owner = chat_owner(chat_id) if chat_id else None
+    if owner is not None and owner != username:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chat_id
+
+
+@app.post("/signup", status_code=201)
+async def signup(body: Credentials):
+    if not await run_in_threadpool(create_user, body.username, body.password):
+        raise HTTPException(status_code=409, detail="Username already exists")
+    return {"username": body.username.strip()}
+
+
+@app.post("/login")
+async def login(body: Credentials):
+    row = await run_in_threadpool(login_user, body.username, body.password)
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    token = await run_in_threadpool(sessions.create, row[0])
+    return {"token": token, "username": row[0]}
+
+
+@app.post("/logout", status_code=204)
+async def logout(authorization: str = Header(None), username: str = Depends(current_user)):
+    await run_in_threadpool(sessions.delete, authorization.removeprefix("Bearer ").strip())
+
+
+# =========================
+# CHAT
+# =========================
+@app.get("/chats")
+async def chats(limit: int = 20, offset: int = 0, username: str = Depends(current_user)):
+    return await run_in_threadpool(list_conversations, username, limit, offset)
+
+
+@app.get("/chats/{chat_id}/messages")
+async def messages(chat_id: str, limit: int = 50, before_id: Optional[int] = None,
+                   username: str = Depends(current_user)):
+    await run_in_threadpool(_owned_chat, chat_id, username)
+    page, cursor = await run_in_threadpool(load_messages, chat_id, limit, before_id)
+    return {"messages": page, "before_id": cursor}
+
+
+@app.post("/chat")
+async def chat(body: ChatRequest, username: str = Depends(current_user)):
+    await run_in_threadpool(_owned_chat, body.chat_id, username)
+    chat_id = await run_in_threadpool(save_chat, username, body.chat_id, "user", body.message)
+    history, _ = await run_in_threadpool(load_messages, chat_id, API_HISTORY_LIMIT)
+    history = [SYSTEM_PROMPT] + history
+
+    if not body.stream:
+        reply = await run_in_threadpool(chat_with_llm, history, chat_id)
+        await run_in_threadpool(save_chat, username, chat_id, "assistant", reply)
+        return {"chat_id": chat_id, "reply": reply}
+
+    def reply_stream():
+        # Iterated on Starlette's thread pool; the reply is saved once the
+        # stream completes.
+        parts = []
+        for piece in chat_with_llm_stream(history, chat_id):
+            parts.append(piece)
+            yield piece
+        save_chat(username, chat_id, "assistant", "".join(parts))
+
+    return StreamingResponse(
+        reply_stream(), media_type="text/plain; charset=utf-8", headers={"X-Chat-Id": chat_id}
+    )
+
+
+# =========================
+# SUMMARIES AND IMAGES (JOBS)
+# =========================
+def _save_to_chat(username, chat_id, content):
+    if chat_id:
+        save_chat(username, chat_id, "assistant", content)
+
+
+def _checked_summary(summary):
+    # Failures come back as text; raising marks the job failed and keeps the
+    # message out of the chat.
+    if summary.startswith(FAILURE_PREFIXES):
+        raise RuntimeError(summary)
+    return summary
+
+
+def _youtube_job(username, url, language, chat_id):
+    summary = _checked_summary(summarize_youtube(url, language))
+    _save_to_chat(username, chat_id, f"YouTube Summary:\n{summary}")
+    return summary
+
+
+class _NamedBytes:
+    # The bits of Streamlit's UploadedFile that utils uses.
+    def __init__(self, data, name):
+        self._data = data
+        self.name = name
+        self.size = len(data)
+
+    def getvalue(self):
+        return self._data
+
+
+def _pdf_job(username, data, name, language, chat_id):
+    summary = _checked_summary(summarize_pdf(_NamedBytes(data, name), language))
+    _save_to_chat(username, chat_id, f"PDF Summary:\n{summary}")
+    return summary
+
+
+def _image_job(username, prompt, chat_id):
+    result = generate_image(prompt)
+    if not result.lower().endswith(".png"):
+        raise RuntimeError(result)
+    image_id = image_id_from_path(result)
+    _save_to_chat(username, chat_id, f"Image generated: {prompt}\n{image_ref(image_id)}")
+    return image_id
+
+
+@app.post("/summaries/youtube", status_code=202)
+async def youtube_summary(body: YouTubeRequest, username: str = Depends(current_user)):
+    _summary_language(body.language)
+    if extract_video_id(body.url) is None:
+        raise HTTPException(status_code=422, detail="Invalid YouTube URL")
+    await run_in_threadpool(_owned_chat, body.chat_id, username)
+    job_id = await run_in_threadpool(
+        jobs.submit, username, "youtube", _youtube_job, username, body.url, body.language, body.chat_id
+    )
+    return {"job_id": job_id}
+
+
+@app.post("/summaries/pdf", status_code=202)
+async def pdf_summary(request: Request, name: str = "upload.pdf", language: str = "English",
+                      chat_id: Optional[str] = None, username: str = Depends(current_user)):
+    """The request body is the PDF file itself."""
+    _summary_language(language)
+    await run_in_threadpool(_owned_chat, chat_id, username)
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty body; send the PDF as the request body")
+    if len(data) > API_MAX_PDF_BYTES:
+        raise HTTPException(status_code=413, detail="PDF too large")
+    job_id = await run_in_threadpool(
+        jobs.submit, username, "pdf", _pdf_job, username, data, name, language, chat_id
+    )
+    return {"job_id": job_id}
+
+
+@app.post("/images", status_code=202)
+async def image(body: ImageRequest, username: str = Depends(current_user)):
+    await run_in_threadpool(_owned_chat, body.chat_id, username)
+    job_id = await run_in_threadpool(jobs.submit, username, "image", _image_job, username, body.prompt, body.chat_id)
+    return {"job_id": job_id}
+
+
+@app.get("/images/{image_id}")
+async def image_file(image_id: str, username: str = Depends(current_user)):
+    path = None
+    if re.fullmatch(r"[0-9a-f]{64}", image_id):
+        path = await run_in_threadpool(image_store.get_path, image_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, media_type="image/png")
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, username: str = Depends(current_user)):
+    job = await run_in_threadpool(jobs.get, job_id)
+    if job is None or job["username"] != username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# =========================
+# OPERATIONS
+# =========================
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True, "models": model_health.snapshot()}
+
+
+@app.get("/metrics")
+async def metrics_text():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
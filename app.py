@@ -1,16 +1,33 @@
+import os
+import uuid
+
 import streamlit as st
-from auth import create_user, login_user, save_chat, load_chats, delete_chat
-from utils import chat_with_llm, generate_image, summarize_youtube, summarize_pdf
+from auth import create_user, login_user, save_chat, delete_chat, list_conversations, load_messages, flush_chats, search_chats, history_version
+from utils import chat_with_llm_stream, generate_image, summarize_youtube_stream, summarize_pdf_stream, index_pdf, SUMMARY_LANGUAGES
+from image_store import image_store, image_ref, image_id_from_path, parse_image_ref
+from metrics import span, start_profile, finish_profile
 
 st.set_page_config(page_title="AI Chatbot", page_icon="🤖", layout="wide")
 
 SYSTEM_PROMPT = {"role": "system", "content": "You are a helpful, friendly AI assistant."}
+HISTORY_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE = 10
+RENDER_WINDOW = 20
 
 st.session_state.setdefault("logged_in", False)
 st.session_state.setdefault("username", "")
 st.session_state.setdefault("messages", [])
 st.session_state.setdefault("chat_id", None)
 st.session_state.setdefault("chat_title", "New Chat")
+st.session_state.setdefault("earlier_cursor", None)
+st.session_state.setdefault("history_limit", HISTORY_PAGE_SIZE)
+st.session_state.setdefault("indexed_pdfs", set())
+st.session_state.setdefault("search_limit", SEARCH_PAGE_SIZE)
+st.session_state.setdefault("render_window", RENDER_WINDOW)
+st.session_state.setdefault("image_paths", {})
+
+# With METRICS_PROFILE=1, every completed rerun logs a per-request breakdown.
+rerun_profile = start_profile("app.rerun")
 
 # =========================
 # AUTH PAGE
@@ -57,6 +74,7 @@ AI Chatbot is an intelligent multi-tool assistant that can chat naturally, summa
                 else:
                     st.error("Username already exists")
 
+    finish_profile(rerun_profile)
     st.stop()
 
 # =========================
@@ -68,40 +86,92 @@ if st.sidebar.button("➕ New Chat"):
     st.session_state.messages = [SYSTEM_PROMPT]
     st.session_state.chat_id = None
     st.session_state.chat_title = "New Chat"
+    st.session_state.earlier_cursor = None
+    st.session_state.render_window = RENDER_WINDOW
     st.rerun()
 
 if st.sidebar.button("🗑 Clear Current Chat"):
     st.session_state.messages = [SYSTEM_PROMPT]
     st.session_state.chat_id = None
     st.session_state.chat_title = "New Chat"
+    st.session_state.earlier_cursor = None
+    st.session_state.render_window = RENDER_WINDOW
     st.rerun()
 
 st.sidebar.divider()
 st.sidebar.subheader("💬 Chat History")
 
-user_chats = load_chats(st.session_state.username, grouped=True) or {}
-for chat_id, chat in user_chats.items():
+def open_chat(chat_id, title):
+    messages, cursor = load_messages(chat_id, limit=RENDER_WINDOW)
+    st.session_state.chat_id = chat_id
+    st.session_state.chat_title = title
+    st.session_state.messages = [SYSTEM_PROMPT] + messages
+    st.session_state.earlier_cursor = cursor
+    st.session_state.render_window = RENDER_WINDOW
+    st.rerun()
+
+def cached(name, key, load):
+    # Keeps the result of load() across reruns until `key` changes. Keys
+    # include history_version(), which save_chat/delete_chat bump.
+    entry = st.session_state.get(name)
+    if entry is None or entry[0] != key:
+        entry = (key, load())
+        st.session_state[name] = entry
+    return entry[1]
+
+username = st.session_state.username
+search_text = st.sidebar.text_input("🔎 Search chats", key="search_text")
+if search_text.strip():
+    results = cached(
+        "search_cache",
+        (username, search_text, st.session_state.search_limit, history_version(username)),
+        lambda: search_chats(username, search_text, limit=st.session_state.search_limit + 1),
+    )
+    if not results:
+        st.sidebar.caption("No matching chats.")
+    for result in results[:st.session_state.search_limit]:
+        if st.sidebar.button(result["title"], key=f"hit_{result['chat_id']}"):
+            open_chat(result["chat_id"], result["title"])
+        st.sidebar.caption(result["snippet"])
+    if len(results) > st.session_state.search_limit:
+        if st.sidebar.button("More results"):
+            st.session_state.search_limit += SEARCH_PAGE_SIZE
+            st.rerun()
+    st.sidebar.divider()
+
+conversations = cached(
+    "conversation_cache",
+    (username, st.session_state.history_limit, history_version(username)),
+    lambda: list_conversations(username, limit=st.session_state.history_limit + 1),
+)
+for conv in conversations[:st.session_state.history_limit]:
+    chat_id = conv["chat_id"]
     c1, c2 = st.sidebar.columns([4, 1])
-    if c1.button(chat["title"], key=f"open_{chat_id}"):
-        st.session_state.chat_id = chat_id
-        st.session_state.chat_title = chat["title"]
-        st.session_state.messages = chat["messages"]
-        st.rerun()
+    if c1.button(conv["title"], key=f"open_{chat_id}"):
+        open_chat(chat_id, conv["title"])
     if c2.button("🗑", key=f"del_{chat_id}"):
         delete_chat(chat_id)
         if st.session_state.chat_id == chat_id:
             st.session_state.messages = [SYSTEM_PROMPT]
             st.session_state.chat_id = None
             st.session_state.chat_title = "New Chat"
+            st.session_state.earlier_cursor = None
+            st.session_state.render_window = RENDER_WINDOW
+        st.rerun()
+
+if len(conversations) > st.session_state.history_limit:
+    if st.sidebar.button("Show more chats"):
+        st.session_state.history_limit += HISTORY_PAGE_SIZE
         st.rerun()
 
 st.sidebar.divider()
 tool = st.sidebar.radio("🛠 Tools", ["Chat", "YouTube Summary", "PDF Summary", "Image Generation"])
 
 st.sidebar.divider()
-summary_language = st.sidebar.radio("🌐 Summary Language", ["English", "Telugu"], index=0)
+summary_language = st.sidebar.radio("🌐 Summary Language", list(SUMMARY_LANGUAGES), index=0)
 
 if st.sidebar.button("Logout"):
+    flush_chats(username=st.session_state.username)
     st.session_state.clear()
     st.rerun()
 
@@ -110,15 +180,48 @@ if st.sidebar.button("Logout"):
 # =========================
 st.title(f"🤖 {st.session_state.chat_title}")
 
+def cached_image_path(image_id):
+    # Resolved once per session; get_path also records the access.
+    path = st.session_state.image_paths.get(image_id)
+    if path is None or not os.path.exists(path):
+        path = image_store.get_path(image_id)
+        st.session_state.image_paths[image_id] = path
+    return path
+
+# Only the newest `render_window` messages are drawn, so a rerun costs the
+# same however long the chat is. Older ones are shown (and, past what is in
+# memory, loaded) a page at a time on request.
+history = st.session_state.messages[1:]
+hidden = len(history) - st.session_state.render_window
+if hidden > 0 or st.session_state.earlier_cursor is not None:
+    if st.button("⬆ Load earlier messages"):
+        if hidden <= 0:
+            earlier, cursor = load_messages(
+                st.session_state.chat_id, limit=RENDER_WINDOW, before_id=st.session_state.earlier_cursor
+            )
+            st.session_state.messages = [SYSTEM_PROMPT] + earlier + history
+            st.session_state.earlier_cursor = cursor
+        st.session_state.render_window += RENDER_WINDOW
+        st.rerun()
+
 # Render chat history (ChatGPT-like memory across tools)
-for msg in st.session_state.messages:
-    if msg["role"] == "system":
-        continue
-    with st.chat_message(msg["role"]):
-        if msg.get("type") == "image":
-            st.image(msg["content"])
-        else:
-            st.markdown(msg["content"])
+with span("app.render_history"):
+    for msg in history[-st.session_state.render_window:]:
+        if msg["role"] == "system":
+            continue
+        with st.chat_message(msg["role"]):
+            image_id = parse_image_ref(msg["content"])
+            if msg.get("type") == "image":
+                st.image(msg["content"])
+            elif image_id is not None:
+                image_path = cached_image_path(image_id)
+                st.markdown(msg["content"].replace(image_ref(image_id), "").strip())
+                if image_path:
+                    st.image(image_path)
+                else:
+                    st.caption("🖼️ This image is no longer available.")
+            else:
+                st.markdown(msg["content"])
 
 # =========================
 # TOOL: CHAT
@@ -130,9 +233,7 @@ if tool == "Chat":
         st.session_state.chat_id = save_chat(st.session_state.username, st.session_state.chat_id, "user", prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = chat_with_llm(st.session_state.messages)
-                st.markdown(response)
+            response = st.write_stream(chat_with_llm_stream(st.session_state.messages, st.session_state.chat_id))
 
         st.session_state.messages.append({"role": "assistant", "content": response})
         save_chat(st.session_state.username, st.session_state.chat_id, "assistant", response)
@@ -148,32 +249,42 @@ elif tool == "YouTube Summary":
             st.warning("Please paste a YouTube URL first.")
         else:
             with st.spinner("Summarizing video..."):
-                summary = summarize_youtube(yt_url, summary_language)
-
-            st.markdown(summary)
+                summary = st.write_stream(summarize_youtube_stream(yt_url, summary_language))
 
             st.session_state.messages.append({
                 "role": "assistant",
                 "content": f"📺 **YouTube Summary:**\n\n{summary}"
             })
-            save_chat(st.session_state.username, st.session_state.chat_id, "assistant", f"YouTube Summary:\n{summary}")
+            st.session_state.chat_id = save_chat(st.session_state.username, st.session_state.chat_id, "assistant", f"YouTube Summary:\n{summary}")
 
 # =========================
 # TOOL: PDF SUMMARY
 # =========================
 elif tool == "PDF Summary":
     uploaded_pdf = st.file_uploader("Upload PDF", type=["pdf"])
+
+    if uploaded_pdf:
+        # Index the upload once per chat so the Chat tool can answer
+        # questions from it without re-summarizing the whole document.
+        if st.session_state.chat_id is None:
+            st.session_state.chat_id = str(uuid.uuid4())
+        pdf_key = (st.session_state.chat_id, uploaded_pdf.name, uploaded_pdf.size)
+        if pdf_key not in st.session_state.indexed_pdfs:
+            with st.spinner("Indexing PDF..."):
+                if index_pdf(uploaded_pdf, st.session_state.chat_id):
+                    st.session_state.indexed_pdfs.add(pdf_key)
+        if pdf_key in st.session_state.indexed_pdfs:
+            st.caption(f"📎 {uploaded_pdf.name} is indexed. Switch to Chat to ask questions about it.")
+
     if uploaded_pdf and st.button("Summarize PDF"):
         with st.spinner("Reading PDF..."):
-            summary = summarize_pdf(uploaded_pdf)
-
-        st.markdown(summary)
+            summary = st.write_stream(summarize_pdf_stream(uploaded_pdf, summary_language))
 
         st.session_state.messages.append({
             "role": "assistant",
             "content": f"📄 **PDF Summary:**\n\n{summary}"
         })
-        save_chat(st.session_state.username, st.session_state.chat_id, "assistant", f"PDF Summary:\n{summary}")
+        st.session_state.chat_id = save_chat(st.session_state.username, st.session_state.chat_id, "assistant", f"PDF Summary:\n{summary}")
 
 # =========================
 # TOOL: IMAGE GENERATION
@@ -182,7 +293,7 @@ elif tool == "Image Generation":
     img_prompt = st.chat_input("Describe the image...")
     if img_prompt:
         st.session_state.messages.append({"role": "user", "content": img_prompt})
-        save_chat(st.session_state.username, st.session_state.chat_id, "user", img_prompt)
+        st.session_state.chat_id = save_chat(st.session_state.username, st.session_state.chat_id, "user", img_prompt)
 
         with st.chat_message("assistant"):
             with st.spinner("Generating image..."):
@@ -190,9 +301,12 @@ elif tool == "Image Generation":
 
                 if isinstance(result, str) and result.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
                     st.image(result)
-                    st.session_state.messages.append({"role": "assistant", "type": "image", "content": result})
-                    save_chat(st.session_state.username, st.session_state.chat_id, "assistant", f"Image generated: {img_prompt}")
+                    content = f"Image generated: {img_prompt}\n{image_ref(image_id_from_path(result))}"
+                    st.session_state.messages.append({"role": "assistant", "content": content})
+                    save_chat(st.session_state.username, st.session_state.chat_id, "assistant", content)
                 else:
                     st.error(result)
                     st.session_state.messages.append({"role": "assistant", "content": result})
                     save_chat(st.session_state.username, st.session_state.chat_id, "assistant", result)
+
+finish_profile(rerun_profile)
@@ -1,141 +1,25 @@
+import atexit
+import logging
+import os
+import re
 import sqlite3
 import hashlib
+import threading
+import time
 import uuid
+from collections import deque
 
-# =========================
-# DATABASE CONNECTIONimport sqlite3
-import hashlib
-import uuid
-
-# =========================
-# DATABASE CONNECTION
-# =========================
-conn = sqlite3.connect("database.db", check_same_thread=False)
-cursor = conn.cursor()
-
-# =========================
-# TABLES
-# =========================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    username TEXT PRIMARY KEY,
-    password TEXT
-)
-""")
+from db import db
+from metrics import timed, incr
 
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chats (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT,
-    chat_id TEXT,
-    role TEXT,
-    content TEXT
-)
-""")
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "0") == "1"
+CHAT_FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "0.25"))
+CHAT_FLUSH_BATCH = 500
+# Longest a read waits for queued messages before going ahead without them.
+CHAT_FLUSH_TIMEOUT = float(os.getenv("CHAT_FLUSH_TIMEOUT", "10"))
+CHAT_RETRY_MAX_SECONDS = 5.0
 
-conn.commit()
-
-# =========================
-# PASSWORD HASH
-# =========================
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-# =========================
-# AUTH FUNCTIONS
-# =========================
-def create_user(username, password):
-    try:
-        cursor.execute(
-            "INSERT INTO users VALUES (?, ?)",
-            (username, hash_password(password))
-        )
-        conn.commit()
-        return True
-    except:
-        return False
-
-def login_user(username, password):
-    cursor.execute(
-        "SELECT * FROM users WHERE username=? AND password=?",
-        (username, hash_password(password))
-    )
-    return cursor.fetchone()
-
-# =========================
-# CHAT FUNCTIONS
-# =========================
-def save_chat(username, chat_id, role, content):
-    if chat_id is None:
-        chat_id = str(uuid.uuid4())
-
-    cursor.execute(
-        "INSERT INTO chats (username, chat_id, role, content) VALUES (?, ?, ?, ?)",
-        (username, chat_id, role, content)
-    )
-    conn.commit()
-    return chat_id
-
-def load_chats(username, grouped=False):
-    cursor.execute(
-        """
-        SELECT chat_id, role, content
-        FROM chats
-        WHERE username=?
-        ORDER BY id
-        """,
-        (username,)
-    )
-    rows = cursor.fetchall()
-
-    if not grouped:
-        return [(r[1], r[2]) for r in rows]
-
-    chats = {}
-    for chat_id, role, content in rows:
-        if chat_id not in chats:
-            chats[chat_id] = {
-                "title": content[:30] if content else "New Chat",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful, friendly AI assistant."}
-                ]
-            }
-        chats[chat_id]["messages"].append({"role": role, "content": content})
-
-    return chats
-
-# =========================
-# DELETE CHAT FUNCTION
-# =========================
-def delete_chat(chat_id):
-    cursor.execute("DELETE FROM chats WHERE chat_id=?", (chat_id,))
-    conn.commit()
-
-# =========================
-conn = sqlite3.connect("database.db", check_same_thread=False)
-cursor = conn.cursor()
-
-# =========================
-# TABLES
-# =========================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    username TEXT PRIMARY KEY,
-    password TEXT NOT NULL
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chats (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT,
-    chat_id TEXT,
-    role TEXT,
-    content TEXT
-)
-""")
-
-conn.commit()
+logger = logging.getLogger(__name__)
 
 # =========================
 # PASSWORD HASH
@@ -146,48 +30,237 @@ def hash_password(password):
 # =========================
 # AUTH FUNCTIONS
 # =========================
+@timed("auth.create_user")
 def create_user(username, password):
     if not username or not password:
         return False
     try:
-        cursor.execute(
-            "INSERT INTO users (username, password) VALUES (?, ?)",
-            (username.strip(), hash_password(password))
-        )
-        conn.commit()
+        with db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (username, password) VALUES (?, ?)",
+                (username.strip(), hash_password(password))
+            )
         return True
     except sqlite3.IntegrityError:
         return False
 
+@timed("auth.login_user")
 def login_user(username, password):
     if not username or not password:
         return None
 
-    cursor.execute(
+    return db.fetchone(
         "SELECT username FROM users WHERE username=? AND password=?",
         (username.strip(), hash_password(password))
     )
-    return cursor.fetchone()
+
+# =========================
+# HISTORY VERSIONS
+# =========================
+# Bumped whenever a user's saved chats change in this process, so the app
+# can keep the sidebar and search results across reruns and reload them
+# only when they are stale.
+_history_lock = threading.Lock()
+_history_versions = {}
+
+def _bump_history(username):
+    with _history_lock:
+        _history_versions[username] = _history_versions.get(username, 0) + 1
+
+def history_version(username):
+    return _history_versions.get(username, 0)
 
 # =========================
 # SAVE CHAT
 # =========================
+def _write_messages(conn, rows):
+    # rows: (username, chat_id, role, content, created_at)
+    conn.executemany(
+        "INSERT INTO chats (username, chat_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.executemany(
+        """
+        INSERT INTO conversations (chat_id, username, title, updated_at, message_count)
+        VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT(chat_id) DO UPDATE SET
+            updated_at = excluded.updated_at,
+            message_count = conversations.message_count + 1,
+            title = CASE
+                WHEN conversations.title = 'New Chat' THEN excluded.title
+                ELSE conversations.title
+            END
+        """,
+        [
+            (chat_id, username, content[:30] if role == "user" and content else "New Chat", created_at)
+            for username, chat_id, role, content, created_at in rows
+        ]
+    )
+
+@timed("auth.save_chat")
 def save_chat(username, chat_id, role, content):
     if chat_id is None:
         chat_id = str(uuid.uuid4())
 
-    cursor.execute(
-        "INSERT INTO chats (username, chat_id, role, content) VALUES (?, ?, ?, ?)",
-        (username, chat_id, role, content)
-    )
-    conn.commit()
+    row = (username, chat_id, role, content, time.time())
+
+    if _chat_writer is not None:
+        _chat_writer.submit(row)
+    else:
+        with db.transaction() as conn:
+            _write_messages(conn, [row])
+    _bump_history(username)
     return chat_id
 
+# =========================
+# WRITE-BEHIND CHAT WRITER
+# =========================
+class ChatWriter:
+    """Queues chat messages and commits them in batches on a background thread.
+
+    Every message gets a sequence number. `flush(username=..., chat_id=...)`
+    blocks until everything that user or chat has queued so far is committed,
+    which is what the read functions below use to see their own writes.
+
+    A batch that fails because the database is busy or unavailable is logged
+    and retried with backoff. A batch that fails for any other reason is
+    written row by row; rows that still fail are logged, kept in `rejected`
+    and skipped, so one bad message cannot hold up everyone else's.
+    """
+
+    def __init__(self, interval=CHAT_FLUSH_INTERVAL, max_batch=CHAT_FLUSH_BATCH):
+        self.interval = interval
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._seq = 0
+        self._committed = 0
+        self._last_seq = {}
+        self._thread = None
+        self._closed = False
+        self.rejected = deque(maxlen=1000)
+
+    def submit(self, row):
+        username, chat_id = row[0], row[1]
+        with self._cond:
+            self._seq += 1
+            self._pending.append((self._seq, row))
+            self._last_seq[("user", username)] = self._seq
+            self._last_seq[("chat", chat_id)] = self._seq
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-writer", daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        # Returns how many rows of `batch` were dealt with (written or
+        # rejected). Raises sqlite3.OperationalError if none were.
+        try:
+            with db.transaction() as conn:
+                _write_messages(conn, [row for _, row in batch])
+            return len(batch)
+        except sqlite3.OperationalError:
+            raise
+        except Exception:
+            logger.exception("chat writer: batch of %d messages failed, retrying one by one", len(batch))
+
+        for done, (seq, row) in enumerate(batch):
+            try:
+                with db.transaction() as conn:
+                    _write_messages(conn, [row])
+            except sqlite3.OperationalError:
+                if done:
+                    return done
+                raise
+            except Exception:
+                logger.exception("chat writer: dropping message %d of chat %s", seq, row[1])
+                incr("chat.write_rejected")
+                self.rejected.append(row)
+        return len(batch)
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                if not self._pending and not self._closed:
+                    self._cond.wait(self.interval)
+                if not self._pending:
+                    if self._closed:
+                        return
+                    continue
+                batch = self._pending[:self.max_batch]
+
+            try:
+                done = self._write(batch)
+            except sqlite3.OperationalError as e:
+                failures += 1
+                incr("chat.write_retries")
+                if self._closed and failures > 3:
+                    logger.error("chat writer: giving up on %d queued messages at exit: %s", len(self._pending), e)
+                    return
+                logger.warning("chat writer: batch of %d messages failed (attempt %d), retrying: %s",
+                               len(batch), failures, e)
+                time.sleep(min(self.interval * 2 ** failures, CHAT_RETRY_MAX_SECONDS))
+                continue
+            failures = 0
+
+            with self._cond:
+                del self._pending[:done]
+                self._committed = batch[done - 1][0]
+                if not self._pending:
+                    self._last_seq.clear()
+                self._cond.notify_all()
+
+    def flush(self, username=None, chat_id=None, timeout=None):
+        with self._cond:
+            if username is None and chat_id is None:
+                target = self._seq
+            else:
+                target = max(
+                    self._last_seq.get(("user", username), 0),
+                    self._last_seq.get(("chat", chat_id), 0),
+                )
+            if target <= self._committed:
+                return True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._committed >= target, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+_chat_writer = ChatWriter() if CHAT_WRITE_BEHIND else None
+if _chat_writer is not None:
+    atexit.register(_chat_writer.close)
+
+@timed("auth.flush_chats")
+def flush_chats(username=None, chat_id=None, timeout=CHAT_FLUSH_TIMEOUT):
+    """Wait until queued messages of the user or chat are written.
+
+    Returns False if that took longer than `timeout`; the caller then reads
+    without them rather than hanging.
+    """
+    if _chat_writer is None:
+        return True
+    if _chat_writer.flush(username=username, chat_id=chat_id, timeout=timeout):
+        return True
+    logger.warning("chat writer: queued messages not written after %.1fs; reading without them", timeout)
+    incr("chat.flush_timeouts")
+    return False
+
 # =========================
 # LOAD CHATS
 # =========================
+@timed("auth.load_chats")
 def load_chats(username, grouped=False):
-    cursor.execute(
+    flush_chats(username=username)
+    rows = db.fetchall(
         """
         SELECT chat_id, role, content
         FROM chats
@@ -196,7 +269,6 @@ def load_chats(username, grouped=False):
         """,
         (username,)
     )
-    rows = cursor.fetchall()
 
     if not grouped:
         return rows
@@ -223,3 +295,150 @@ def load_chats(username, grouped=False):
         )
 
     return chats
+
+# =========================
+# CONVERSATION INDEX
+# =========================
+@timed("auth.list_conversations")
+def list_conversations(username, limit=20, offset=0):
+    flush_chats(username=username)
+    rows = db.fetchall(
+        """
+        SELECT chat_id, title, updated_at, message_count
+        FROM conversations
+        WHERE username=?
+        ORDER BY updated_at DESC, rowid DESC
+        LIMIT ? OFFSET ?
+        """,
+        (username, limit, offset)
+    )
+    return [
+        {"chat_id": r[0], "title": r[1], "updated_at": r[2], "message_count": r[3]}
+        for r in rows
+    ]
+
+@timed("auth.load_messages")
+def load_messages(chat_id, limit=50, before_id=None):
+    """Return up to `limit` of the newest messages of a chat, oldest first.
+
+    The second value is the cursor to pass as `before_id` for the page before
+    this one, or None when there is nothing earlier.
+    """
+    flush_chats(chat_id=chat_id)
+    query = "SELECT id, role, content FROM chats WHERE chat_id=?"
+    params = [chat_id]
+    if before_id is not None:
+        query += " AND id<?"
+        params.append(before_id)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = db.fetchall(query, params)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    messages = [{"role": role, "content": content} for _, role, content in reversed(rows)]
+    return messages, (rows[-1][0] if has_more else None)
+
+@timed("auth.messages_after")
+def messages_after(chat_id, after_id=0):
+    """Return the chat's saved message count and its messages after `after_id`.
+
+    Messages are (id, role, content) tuples, oldest first.
+    """
+    flush_chats(chat_id=chat_id)
+    row = db.fetchone("SELECT message_count FROM conversations WHERE chat_id=?", (chat_id,))
+    rows = db.fetchall(
+        "SELECT id, role, content FROM chats WHERE chat_id=? AND id>? ORDER BY id",
+        (chat_id, after_id)
+    )
+    return (row[0] if row else 0), rows
+
+@timed("auth.chat_owner")
+def chat_owner(chat_id):
+    """Username that owns `chat_id`, or None if nothing was saved to it yet."""
+    flush_chats(chat_id=chat_id)
+    row = db.fetchone("SELECT username FROM conversations WHERE chat_id=?", (chat_id,))
+    return row[0] if row else None
+
+# =========================
+# SEARCH CHATS
+# =========================
+_SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+def _search_query(username, text):
+    # Every word must match (as a prefix, for search-as-you-type); quoting
+    # keeps FTS5 operators typed by the user from being interpreted. The
+    # username phrase keeps the match to this user's messages, so a search
+    # costs the same however many other users there are; it can also match
+    # a similar name, which the join on chats.username filters out.
+    terms = [f'"{t}"*' for t in _SEARCH_TERM.findall(text)]
+    if not terms:
+        return None
+    query = "content:(" + " AND ".join(terms) + ")"
+    name = " ".join(_SEARCH_TERM.findall(username))
+    if name:
+        query = f'username:"{name}" AND ' + query
+    return query
+
+@timed("auth.search_chats")
+def search_chats(username, text, limit=10, offset=0):
+    """Return the user's chats matching `text`, best match first.
+
+    Each result has chat_id, title and a snippet of the best-matching message
+    with the matched terms in **bold**.
+    """
+    query = _search_query(username, text)
+    if query is None:
+        return []
+
+    # CROSS JOIN keeps the FTS match as the outer loop: it runs once and each
+    # hit is checked against its chats row by primary key. With chats first,
+    # the planner reruns the MATCH for every one of the user's messages.
+    # Snippets are only made for the best message of the chats on this page,
+    # in one more pass over the page's rowid range: a MATCH per row would
+    # expand the prefix terms over the whole index again for each of them.
+    flush_chats(username=username)
+    rows = db.fetchall(
+        """
+        WITH hits AS MATERIALIZED (
+            SELECT c.chat_id AS chat_id, c.id AS id, chats_fts.rank AS score
+            FROM chats_fts
+            CROSS JOIN chats c ON c.id = chats_fts.rowid
+            WHERE chats_fts MATCH ? AND c.username = ?
+        ),
+        best AS MATERIALIZED (
+            SELECT chat_id, id, MIN(score) AS score
+            FROM hits
+            GROUP BY chat_id
+            ORDER BY score
+            LIMIT ? OFFSET ?
+        )
+        SELECT b.chat_id, COALESCE(v.title, 'New Chat'), snippet(chats_fts, 1, '**', '**', '…', 12)
+        FROM chats_fts
+        CROSS JOIN best b ON b.id = chats_fts.rowid
+        LEFT JOIN conversations v ON v.chat_id = b.chat_id
+        WHERE chats_fts MATCH ?
+          AND chats_fts.rowid BETWEEN (SELECT MIN(id) FROM best) AND (SELECT MAX(id) FROM best)
+        ORDER BY b.score
+        """,
+        (query, username, limit, offset, query)
+    )
+    return [
+        {"chat_id": r[0], "title": r[1], "snippet": r[2]}
+        for r in rows
+    ]
+
+# =========================
+# DELETE CHAT FUNCTION
+# =========================
+@timed("auth.delete_chat")
+def delete_chat(chat_id):
+    owner = chat_owner(chat_id)
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM chats WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM conversations WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM chat_documents WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM chat_summaries WHERE chat_id=?", (chat_id,))
+    if owner is not None:
+        _bump_history(owner)
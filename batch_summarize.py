@@ -0,0 +1,124 @@
+"""Summarize many PDFs and YouTube videos from the command line.
+
+    python batch_summarize.py handbooks/ report.pdf https://youtu.be/VIDEO_ID
+    python batch_summarize.py --urls-file videos.txt --concurrency 4 --language Telugu
+
+Inputs are PDF files, folders (searched recursively for PDFs), YouTube URLs,
+and files with one URL per line. Every chunk's partial summary is
+checkpointed in the database as it completes, so rerunning the same command
+after a crash or a rate-limit failure resumes where it stopped; inputs that
+already finished come straight from the summary cache. Running again with
+another --language reuses the partial summaries and makes one call per input.
+All Groq calls share the process-wide rate limiter, whatever --concurrency is.
+Each PDF's summary file name carries a short hash of its path, so PDFs with
+the same name in different folders do not overwrite each other.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache import hash_bytes
+from utils import summarize_pdf, summarize_youtube, extract_video_id, SUMMARY_LANGUAGES, FAILURE_PREFIXES
+
+
+def collect_inputs(paths, urls_file=None):
+    """Return [(kind, source)] in a stable order, and the arguments not understood."""
+    items, unknown = [], []
+    candidates = list(paths)
+    if urls_file:
+        with open(urls_file, encoding="utf-8") as f:
+            candidates += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    for arg in candidates:
+        if os.path.isdir(arg):
+            for root, _, files in sorted(os.walk(arg)):
+                items += [("pdf", os.path.join(root, name)) for name in sorted(files) if name.lower().endswith(".pdf")]
+        elif arg.lower().endswith(".pdf") and os.path.isfile(arg):
+            items.append(("pdf", arg))
+        elif extract_video_id(arg):
+            items.append(("youtube", arg))
+        else:
+            unknown.append(arg)
+
+    seen, unique = set(), []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique.append(item)
+    return unique, unknown
+
+
+def output_name(kind, source, language):
+    if kind == "pdf":
+        stem = os.path.splitext(os.path.basename(source))[0]
+        path_hash = hash_bytes(os.path.abspath(source).encode("utf-8"))[:8]
+        return f"{stem}-{path_hash}-{language.lower()}.md"
+    return f"youtube-{extract_video_id(source)}-{language.lower()}.md"
+
+
+def summarize_one(kind, source, language):
+    start = time.perf_counter()
+    try:
+        if kind == "pdf":
+            summary = summarize_pdf(source, language)
+        else:
+            summary = summarize_youtube(source, language)
+        ok = not summary.startswith(FAILURE_PREFIXES)
+    except Exception as e:
+        summary, ok = f"❌ Error: {e}", False
+    return ok, summary, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*", help="PDF files, folders of PDFs, or YouTube URLs")
+    parser.add_argument("--urls-file", help="file with one YouTube URL (or PDF path) per line")
+    parser.add_argument("--language", default="English", choices=list(SUMMARY_LANGUAGES),
+                        help="summary language")
+    parser.add_argument("--concurrency", type=int, default=2, help="inputs summarized at once")
+    parser.add_argument("--output-dir", default="summaries")
+    args = parser.parse_args()
+
+    items, unknown = collect_inputs(args.inputs, args.urls_file)
+    for arg in unknown:
+        print(f"skipping {arg!r}: not a PDF, folder or YouTube URL", file=sys.stderr)
+    if not items:
+        parser.error("nothing to summarize")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    width = len(str(len(items)))
+    failed = []
+    done = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        jobs = {
+            pool.submit(summarize_one, kind, source, args.language): (kind, source)
+            for kind, source in items
+        }
+        for job in as_completed(jobs):
+            kind, source = jobs[job]
+            ok, summary, seconds = job.result()
+            done += 1
+            if ok:
+                path = os.path.join(args.output_dir, output_name(kind, source, args.language))
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(summary + "\n")
+                detail = path
+            else:
+                failed.append(source)
+                detail = summary.splitlines()[0][:120]
+            status = "ok" if ok else "FAILED"
+            print(f"[{done:>{width}}/{len(items)}] {status:<6} {source} ({seconds:.1f}s) {detail}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    print(f"{len(items) - len(failed)} done, {len(failed)} failed in {elapsed:.1f}s", file=sys.stderr)
+    if failed:
+        print("rerun the same command to resume the failed inputs", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Compare the fixed 3500-character chunker with the token-budgeted one.
+
+Runs the real map-reduce engine against a fake Groq client whose latency is
+a fixed round trip plus a per-token cost, and reports LLM call counts, tokens
+sent and wall time for both chunkers. No API key or network is needed.
+
+    python benchmarks/chunking_bench.py --pages 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+import utils  # noqa: E402
+
+WORDS = "the model summary page section result data system user report value process".split()
+
+
+def legacy_chunk_text(text, max_chars=3500):
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def make_document(pages, seed=0):
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(pages * 4):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))).capitalize() + "."
+            for _ in range(rng.randint(2, 6))
+        ]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+class FakeCompletions:
+    def __init__(self, round_trip, per_token):
+        self.round_trip = round_trip
+        self.per_token = per_token
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, stream=False, **kwargs):
+        prompt = messages[-1]["content"]
+        tokens = utils.count_tokens(prompt)
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+        time.sleep(self.round_trip + tokens * self.per_token)
+
+        text = "Partial summary. " * 20
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def run(name, chunker, text, args):
+    completions = FakeCompletions(args.round_trip, args.per_token)
+    utils.groq_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    start = time.perf_counter()
+    chunks = list(chunker(text))
+    chunk_seconds = time.perf_counter() - start
+    utils.map_reduce_summarize(chunks, "Summarize:\n{text}", "Combine:\n{text}", "Final:\n{text}")
+    total_seconds = time.perf_counter() - start
+
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "mid_word_cuts": sum(1 for c in chunks[:-1] if c[-1:].isalnum()),
+        "llm_calls": completions.calls,
+        "tokens_sent": completions.tokens,
+        "chunking_seconds": round(chunk_seconds, 4),
+        "wall_seconds": round(total_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--round-trip", type=float, default=0.05, help="fake per-call latency in seconds")
+    parser.add_argument("--per-token", type=float, default=0.00001, help="fake latency per prompt token")
+    args = parser.parse_args()
+
+    text = make_document(args.pages)
+    results = [
+        run("fixed_3500_chars", legacy_chunk_text, text, args),
+        run("token_budgeted", utils.chunk_text, text, args),
+    ]
+    print(json.dumps({"pages": args.pages, "chars": len(text), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measure worker cold start: importing the app's modules, lazily vs eagerly.
+
+Each run is a fresh interpreter. "lazy" is `import auth, utils` as the app
+does it now; "eager" additionally loads every tool (all four SDKs and the
+Groq client), which is what importing utils used to cost. Also reports which
+SDKs are already imported after `import auth, utils` and whether the
+database was touched.
+
+    python benchmarks/import_bench.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SDKS = ["groq", "youtube_transcript_api", "huggingface_hub", "pypdf"]
+
+PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+import auth, utils
+imported = time.perf_counter() - start
+sdks = [m for m in {sdks!r} if m in sys.modules]
+db_touched = os.path.exists(os.environ["DATABASE_PATH"])
+import tools
+if {eager!r}:
+    tools.load_all()
+total = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": imported,
+    "total_seconds": total,
+    "sdks_at_import": sdks,
+    "db_touched_at_import": db_touched,
+    "tools": tools.tool_status(),
+}}))
+"""
+
+
+def run_probe(eager):
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "bench")
+    env["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(sdks=SDKS, eager=eager)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {"runs": args.runs}
+    for mode, eager in (("lazy", False), ("eager", True)):
+        results = [run_probe(eager) for _ in range(args.runs)]
+        report[mode] = {
+            "median_seconds": round(statistics.median(r["total_seconds"] for r in results), 4),
+            "sdks_at_import": results[-1]["sdks_at_import"],
+            "db_touched_at_import": results[-1]["db_touched_at_import"],
+        }
+        if eager:
+            report[mode]["tool_load_seconds"] = {
+                name: round(statistics.median(r["tools"][name]["load_seconds"] for r in results), 4)
+                for name in results[-1]["tools"]
+            }
+    report["speedup"] = round(report["eager"]["median_seconds"] / report["lazy"]["median_seconds"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark PDF text extraction on a synthetic multi-hundred-page PDF.
+
+Compares the old serial "".join(page.extract_text() ...) with the page
+stream from pdf_pages.iter_pages, cold (process pool) and warm (page cache),
+reporting wall time and peak Python heap in the calling process.
+
+    python benchmarks/pdf_extract_bench.py --pages 400
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from pypdf import PdfReader  # noqa: E402
+
+import pdf_pages  # noqa: E402
+from cache import PdfPageCache, hash_bytes  # noqa: E402
+
+WORDS = "the model summary page section result data system user report value process".split()
+
+
+def make_pdf(pages, lines_per_page=45, seed=0):
+    """Build a text-only PDF by hand (Helvetica, one content stream per page)."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for _ in range(pages):
+        lines = [
+            " ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "."
+            for _ in range(lines_per_page)
+        ]
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        ops += [f"({line}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{k} 0 R" for k in kids).encode(), len(kids)
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def measure(name, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chars = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"mode": name, "seconds": round(seconds, 3), "peak_heap_mb": round(peak / 2**20, 2), "chars": chars}
+
+
+def consume(pages):
+    # Stands in for the chunker: looks at each page once, keeps nothing.
+    return sum(len(text) for text in pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400)
+    args = parser.parse_args()
+
+    data = make_pdf(args.pages)
+    doc_hash = hash_bytes(data)
+    page_cache = PdfPageCache()
+
+    results = [
+        measure("serial_join", lambda: len("".join(
+            (page.extract_text() or "") for page in PdfReader(io.BytesIO(data)).pages
+        ))),
+        measure("stream_cold", lambda: consume(pdf_pages.iter_pages(data, doc_hash, page_cache))),
+        measure("stream_warm_cache", lambda: consume(pdf_pages.iter_pages(data, doc_hash, page_cache))),
+    ]
+    print(json.dumps({
+        "pages": args.pages,
+        "pdf_mb": round(len(data) / 2**20, 2),
+        "workers": pdf_pages.PDF_PROCESS_WORKERS,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
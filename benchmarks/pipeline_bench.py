@@ -0,0 +1,311 @@
+"""End-to-end benchmark of the summary, chat and image pipelines, offline.
+
+Groq, the Hugging Face InferenceClient and YouTubeTranscriptApi are replaced
+by local stand-ins with configurable latency, error rate and a server-side
+rate limit. The real pipelines in utils run over generated PDFs and
+transcripts of several sizes, and each scenario reports wall time, call
+counts, tokens sent and peak Python heap as JSON.
+
+    python benchmarks/pipeline_bench.py --pdf-pages 20,200 --transcript-words 5000,50000
+    python benchmarks/pipeline_bench.py --llm-error-rate 0.05 --server-rpm 120 --output out.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_PATH", os.path.join(_tmp, "bench.db"))
+os.environ.setdefault("IMAGE_STORE_DIR", os.path.join(_tmp, "images"))
+os.environ.setdefault("GROQ_API_KEY", "bench")
+
+from PIL import Image  # noqa: E402
+
+import auth  # noqa: E402
+import utils  # noqa: E402
+from llm import LLMScheduler  # noqa: E402
+from tools import override_tool  # noqa: E402
+from pdf_extract_bench import make_pdf, WORDS  # noqa: E402
+
+
+# =========================
+# STAND-INS
+# =========================
+class FakeAPIError(Exception):
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"{status_code} {message}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class FakeService:
+    """Latency, random 5xx and a requests-per-minute limit shared by a fake API."""
+
+    def __init__(self, latency, jitter, error_rate, rpm=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = []
+        self.stats = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"calls": 0, "errors": 0, "rate_limited": 0, "tokens_in": 0, "tokens_out": 0}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def enter(self):
+        # Decides the outcome of one request before it "runs".
+        with self.lock:
+            self.stats["calls"] += 1
+            now = time.monotonic()
+            if self.rpm:
+                self.recent = [t for t in self.recent if now - t < 60]
+                if len(self.recent) >= self.rpm:
+                    self.stats["rate_limited"] += 1
+                    raise FakeAPIError(429, "Too Many Requests", retry_after=round(60 - (now - self.recent[0]), 2))
+                self.recent.append(now)
+            fail = self.rng.random() < self.error_rate
+            delay = self.latency + self.rng.random() * self.jitter
+        time.sleep(delay)
+        if fail:
+            self.count("errors")
+            raise FakeAPIError(503, "Service Unavailable")
+
+
+class FakeCompletions:
+    def __init__(self, service, reply_tokens):
+        self.service = service
+        self.reply_tokens = reply_tokens
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.service.enter()
+        tokens_in = sum(utils.count_tokens(m["content"] or "") for m in messages)
+        reply = " ".join(WORDS[i % len(WORDS)] for i in range(self.reply_tokens))
+        tokens_out = utils.count_tokens(reply)
+        self.service.count("tokens_in", tokens_in)
+        self.service.count("tokens_out", tokens_out)
+
+        if stream:
+            pieces = reply.split(" ")
+            return iter([
+                types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=p + " "))])
+                for p in pieces
+            ])
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=reply))],
+            usage=types.SimpleNamespace(
+                prompt_tokens=tokens_in, completion_tokens=tokens_out, total_tokens=tokens_in + tokens_out
+            ),
+        )
+
+
+class FakeGroq:
+    def __init__(self, service, reply_tokens):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions(service, reply_tokens))
+
+
+class FakeInferenceClient:
+    def __init__(self, service):
+        self.service = service
+
+    def text_to_image(self, prompt, model=None):
+        self.service.enter()
+        self.service.count("tokens_in", utils.count_tokens(prompt))
+        shade = sum(prompt.encode("utf-8")) % 256
+        return Image.new("RGB", (64, 64), (shade, 255 - shade, 128))
+
+
+class FakeNoTranscriptFound(Exception):
+    pass
+
+
+class FakeTranscript:
+    def __init__(self, video_id, words, language_code="en", language="English"):
+        self.video_id = video_id
+        self.words = words
+        self.language_code = language_code
+        self.language = language
+        self.is_generated = True
+
+    def fetch(self):
+        rng = random.Random(self.video_id)
+        return [
+            types.SimpleNamespace(text=" ".join(rng.choice(WORDS) for _ in range(min(10, self.words - i))))
+            for i in range(0, self.words, 10)
+        ]
+
+
+class FakeTranscriptList:
+    def __init__(self, transcripts):
+        self.transcripts = transcripts
+
+    def __iter__(self):
+        return iter(self.transcripts)
+
+    def find_transcript(self, languages):
+        for code in languages:
+            for t in self.transcripts:
+                if t.language_code == code:
+                    return t
+        raise FakeNoTranscriptFound(languages)
+
+
+def fake_transcript_api(service, words_by_video):
+    # Stands in for the youtube_transcript_api module.
+    class FakeYouTubeTranscriptApi:
+        def list(self, video_id):
+            service.enter()
+            return FakeTranscriptList([FakeTranscript(video_id, words_by_video[video_id])])
+
+    return types.SimpleNamespace(
+        YouTubeTranscriptApi=FakeYouTubeTranscriptApi,
+        NoTranscriptFound=FakeNoTranscriptFound,
+        TranscriptsDisabled=type("FakeTranscriptsDisabled", (Exception,), {}),
+        VideoUnavailable=type("FakeVideoUnavailable", (Exception,), {}),
+    )
+
+
+# =========================
+# SCENARIOS
+# =========================
+def measure(name, services, fn, **info):
+    for service in services.values():
+        service.reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    try:
+        output = fn()
+    except Exception as e:
+        output, error = "", f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = dict(info, scenario=name, seconds=round(seconds, 3), peak_heap_mb=round(peak / 2**20, 2),
+                  output_chars=len(output))
+    if error:
+        result["error"] = error
+    for api, service in services.items():
+        result[api] = dict(service.stats)
+    return result
+
+
+def chat_session(turns, chat_id):
+    # Saves every message before the next call, as the app does, so the
+    # rolling summary is cached the way it is in production.
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+    rng = random.Random(chat_id)
+    reply = ""
+    for _ in range(turns):
+        question = " ".join(rng.choice(WORDS) for _ in range(40)) + "?"
+        messages.append({"role": "user", "content": question})
+        auth.save_chat("bench", chat_id, "user", question)
+        reply = "".join(utils.chat_with_llm_stream(messages, chat_id))
+        messages.append({"role": "assistant", "content": reply})
+        auth.save_chat("bench", chat_id, "assistant", reply)
+    return reply
+
+
+def parse_sizes(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-pages", default="20,100")
+    parser.add_argument("--transcript-words", default="2000,20000")
+    parser.add_argument("--chat-turns", type=int, default=40)
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=150)
+    parser.add_argument("--server-rpm", type=int, default=0, help="fake Groq rate limit, 0 for none")
+    parser.add_argument("--client-rpm", type=float, default=0, help="scheduler requests/min, 0 for none")
+    parser.add_argument("--client-tpm", type=float, default=0, help="scheduler tokens/min, 0 for none")
+    parser.add_argument("--image-latency", type=float, default=0.1)
+    parser.add_argument("--image-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    services = {
+        "groq": FakeService(args.llm_latency, args.llm_latency / 2, args.llm_error_rate, args.server_rpm, args.seed),
+        "hf": FakeService(args.image_latency, args.image_latency / 2, args.image_error_rate, seed=args.seed),
+        "youtube": FakeService(args.transcript_latency, 0, 0.0, seed=args.seed),
+    }
+    words_by_video = {}
+    utils.groq_client = FakeGroq(services["groq"], args.reply_tokens)
+    utils.get_hf_client = lambda: FakeInferenceClient(services["hf"])
+    override_tool("youtube", fake_transcript_api(services["youtube"], words_by_video))
+    utils.scheduler = LLMScheduler(rpm=args.client_rpm, tpm=args.client_tpm, backoff=0.05)
+
+    results = []
+    for pages in parse_sizes(args.pdf_pages):
+        data = make_pdf(pages, seed=args.seed + pages)
+        for run in ("cold", "warm"):
+            results.append(measure(
+                f"summarize_pdf_{run}", services,
+                lambda: utils.summarize_pdf(io.BytesIO(data)),
+                pages=pages, pdf_mb=round(len(data) / 2**20, 2),
+            ))
+
+    for words in parse_sizes(args.transcript_words):
+        video_id = f"bench{words:06d}"[-11:]
+        words_by_video[video_id] = words
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        for run in ("cold", "warm"):
+            results.append(measure(
+                f"summarize_youtube_{run}", services,
+                lambda: utils.summarize_youtube(url, "English"),
+                transcript_words=words,
+            ))
+
+    if args.chat_turns:
+        results.append(measure(
+            "chat_session", services,
+            lambda: chat_session(args.chat_turns, f"bench-chat-{args.seed}"),
+            turns=args.chat_turns,
+        ))
+
+    prompts = [f"a lighthouse at dusk, variation {i}" for i in range(args.images)]
+    for run in ("cold", "warm"):
+        if prompts:
+            results.append(measure(
+                f"generate_image_{run}", services,
+                lambda: "\n".join(utils.generate_image(p) for p in prompts),
+                images=len(prompts),
+            ))
+
+    report = {
+        "config": vars(args),
+        "scheduler": utils.scheduler.metrics(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
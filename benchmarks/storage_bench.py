@@ -0,0 +1,324 @@
+"""Storage-layer scaling benchmark and concurrent-session stress test.
+
+Seeds a throwaway database with synthetic users and conversations, then
+measures per-operation latency percentiles of the auth.py functions the app
+calls. A second phase drives N concurrent simulated sessions against the
+shared pool and checks that every chat reads back exactly the messages its
+session wrote, in order, with nothing lost or interleaved. A "heavy user"
+with tens of thousands of messages checks that reads over one user's whole
+history (search in particular) do not grow with its size, and a crowd of
+users with a long history each checks that they do not grow with everyone
+else's either.
+
+    python benchmarks/storage_bench.py --users 1000 --chats-per-user 20 --messages-per-chat 50
+    python benchmarks/storage_bench.py --heavy-user-messages 100000
+    python benchmarks/storage_bench.py --crowd-users 500 --crowd-messages 2000
+    python benchmarks/storage_bench.py --sessions 32 --turns 100 --write-behind
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORDS = "the model summary page section result data system user report value process".split()
+SEED_BATCH = 20000
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pick(p):
+        return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 3)
+
+    return {
+        "count": len(samples),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+# =========================
+# SEEDING
+# =========================
+def seed(auth, users, chats_per_user, messages_per_chat, rng):
+    """Bulk-load synthetic data through the same write path as save_chat."""
+    start = time.perf_counter()
+    with auth.db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users (username, password) VALUES (?, ?)",
+            [(f"user{u}", auth.hash_password(f"pw{u}")) for u in range(users)]
+        )
+
+    now = time.time()
+    batch, rows = [], 0
+    for u in range(users):
+        for c in range(chats_per_user):
+            chat_id = f"u{u}-c{c}"
+            for m in range(messages_per_chat):
+                role = "user" if m % 2 == 0 else "assistant"
+                batch.append((f"user{u}", chat_id, role, sentence(rng), now + rows * 1e-6))
+                rows += 1
+                if len(batch) >= SEED_BATCH:
+                    with auth.db.transaction() as conn:
+                        auth._write_messages(conn, batch)
+                    batch = []
+    if batch:
+        with auth.db.transaction() as conn:
+            auth._write_messages(conn, batch)
+    return {"users": users, "messages": rows, "seconds": round(time.perf_counter() - start, 2)}
+
+
+# =========================
+# LATENCY
+# =========================
+def time_calls(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def latency_phase(auth, users, chats_per_user, samples, rng):
+    def some_user():
+        return rng.randrange(users)
+
+    def some_chat():
+        return f"u{some_user()}-c{rng.randrange(chats_per_user)}"
+
+    results = {
+        "login_user": time_calls(
+            auth.login_user, [(f"user{u}", f"pw{u}") for u in (some_user() for _ in range(samples))]
+        ),
+        "save_chat": time_calls(
+            auth.save_chat,
+            [(f"user{c.split('-')[0][1:]}", c, "user", sentence(rng)) for c in (some_chat() for _ in range(samples))]
+        ),
+        "list_conversations": time_calls(
+            auth.list_conversations, [(f"user{some_user()}",) for _ in range(samples)]
+        ),
+        "load_messages": time_calls(
+            auth.load_messages, [(some_chat(),) for _ in range(samples)]
+        ),
+        "search_chats": time_calls(
+            auth.search_chats, [(f"user{some_user()}", rng.choice(WORDS)) for _ in range(samples)]
+        ),
+        # Whole history of one user; the slowest read, so sampled less.
+        "load_chats": time_calls(
+            auth.load_chats, [(f"user{some_user()}",) for _ in range(max(1, samples // 10))]
+        ),
+    }
+    # Each chat is deleted at most once.
+    doomed = list({some_chat() for _ in range(samples)})
+    results["delete_chat"] = time_calls(auth.delete_chat, [(c,) for c in doomed])
+    return results
+
+
+def seed_user(auth, username, messages, rng, messages_per_chat=50):
+    """Give `username` `messages` messages; returns the number of chats."""
+    auth.create_user(username, "pw")
+    now = time.time()
+    chats = max(1, messages // messages_per_chat)
+    rows = [
+        (username, f"{username}-c{m % chats}", "user" if m % 2 == 0 else "assistant", sentence(rng), now + m * 1e-6)
+        for m in range(messages)
+    ]
+    for start in range(0, len(rows), SEED_BATCH):
+        with auth.db.transaction() as conn:
+            auth._write_messages(conn, rows[start:start + SEED_BATCH])
+    return chats
+
+
+def search_latency(auth, usernames, samples, rng):
+    return {
+        "search_chats": time_calls(
+            auth.search_chats, [(rng.choice(usernames), rng.choice(WORDS)) for _ in range(samples)]
+        ),
+        "search_chats_two_terms": time_calls(
+            auth.search_chats, [(rng.choice(usernames), " ".join(rng.sample(WORDS, 2))) for _ in range(samples)]
+        ),
+    }
+
+
+def heavy_user_phase(auth, messages, samples, rng):
+    """Latency for one user holding `messages` messages."""
+    username = "heavy"
+    chats = seed_user(auth, username, messages, rng)
+
+    return {
+        "messages": messages,
+        "chats": chats,
+        **search_latency(auth, [username], samples, rng),
+        "list_conversations": time_calls(auth.list_conversations, [(username,) for _ in range(samples)]),
+        "load_messages": time_calls(
+            auth.load_messages, [(f"{username}-c{rng.randrange(chats)}",) for _ in range(samples)]
+        ),
+    }
+
+
+def crowd_phase(auth, users, messages_per_user, samples, rng):
+    """Search latency for users of ordinary size among many others."""
+    usernames = [f"crowd{u}" for u in range(users)]
+    start = time.perf_counter()
+    for username in usernames:
+        seed_user(auth, username, messages_per_user, rng)
+    return {
+        "users": users,
+        "messages": users * messages_per_user,
+        "seed_seconds": round(time.perf_counter() - start, 2),
+        **search_latency(auth, usernames, samples, rng),
+    }
+
+
+# =========================
+# CONCURRENT SESSIONS
+# =========================
+def run_session(auth, session, turns, shared_user, seed_value, written, errors, latencies):
+    rng = random.Random(seed_value)
+    username = "shared" if shared_user else f"session{session}"
+    chat_id = None
+    expected = []
+    try:
+        auth.create_user(username, "pw")
+        for turn in range(turns):
+            for role in ("user", "assistant"):
+                content = f"s{session} t{turn} {role} {sentence(rng, 6)}"
+                start = time.perf_counter()
+                chat_id = auth.save_chat(username, chat_id, role, content)
+                latencies["save_chat"].append(time.perf_counter() - start)
+                expected.append((role, content))
+
+            # A rerun reads the chat and the sidebar after every turn.
+            start = time.perf_counter()
+            auth.load_messages(chat_id, limit=20)
+            latencies["load_messages"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            auth.list_conversations(username)
+            latencies["list_conversations"].append(time.perf_counter() - start)
+            if turn % 10 == 0:
+                start = time.perf_counter()
+                auth.login_user(username, "pw")
+                latencies["login_user"].append(time.perf_counter() - start)
+    except Exception as e:
+        errors.append(f"session {session}: {type(e).__name__}: {e}")
+    written[session] = (chat_id, expected)
+
+
+def check_sessions(auth, written):
+    problems = []
+    for session, (chat_id, expected) in sorted(written.items()):
+        if chat_id is None:
+            problems.append(f"session {session}: no chat created")
+            continue
+        messages, _ = auth.load_messages(chat_id, limit=len(expected) + 10)
+        actual = [(m["role"], m["content"]) for m in messages]
+        if actual != expected:
+            lost = len([e for e in expected if e not in actual])
+            foreign = len([a for a in actual if a not in expected])
+            problems.append(
+                f"session {session}: {len(actual)} rows read, {len(expected)} written, "
+                f"{lost} lost, {foreign} foreign" + ("" if lost or foreign else ", out of order")
+            )
+            continue
+        count = auth.db.fetchone(
+            "SELECT message_count FROM conversations WHERE chat_id=?", (chat_id,)
+        )
+        if count is None or count[0] != len(expected):
+            problems.append(f"session {session}: conversations.message_count={count and count[0]}")
+    return problems
+
+
+def stress_phase(auth, sessions, turns, shared_user, rng):
+    written, errors = {}, []
+    latencies = {"save_chat": [], "load_messages": [], "list_conversations": [], "login_user": []}
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(auth, s, turns, shared_user, rng.random(), written, errors, latencies),
+        )
+        for s in range(sessions)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    auth.flush_chats()
+    seconds = time.perf_counter() - start
+
+    operations = sum(len(v) for v in latencies.values())
+    problems = errors + check_sessions(auth, written)
+    return {
+        "sessions": sessions,
+        "turns": turns,
+        "shared_user": shared_user,
+        "seconds": round(seconds, 3),
+        "operations": operations,
+        "ops_per_second": round(operations / seconds, 1) if seconds else None,
+        "latency": {name: percentiles(v) for name, v in latencies.items()},
+        "correct": not problems,
+        "problems": problems[:20],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chats-per-user", type=int, default=10)
+    parser.add_argument("--messages-per-chat", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=200, help="calls timed per operation")
+    parser.add_argument("--heavy-user-messages", type=int, default=30000,
+                        help="messages held by the single heavy user (0 to skip)")
+    parser.add_argument("--crowd-users", type=int, default=200,
+                        help="users seeded for the crowd search test (0 to skip)")
+    parser.add_argument("--crowd-messages", type=int, default=1500, help="messages per crowd user")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--shared-user", action="store_true", help="all sessions log in as one user")
+    parser.add_argument("--write-behind", action="store_true", help="enable CHAT_WRITE_BEHIND")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # Both are read at import time.
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["CHAT_WRITE_BEHIND"] = "1" if args.write_behind else "0"
+    import auth
+
+    rng = random.Random(args.seed)
+    report = {"config": vars(args)}
+    report["seed"] = seed(auth, args.users, args.chats_per_user, args.messages_per_chat, rng)
+    report["latency"] = latency_phase(auth, args.users, args.chats_per_user, args.samples, rng)
+    if args.heavy_user_messages:
+        report["heavy_user"] = heavy_user_phase(auth, args.heavy_user_messages, args.samples, rng)
+    if args.crowd_users:
+        report["crowd"] = crowd_phase(auth, args.crowd_users, args.crowd_messages, args.samples, rng)
+    report["stress"] = stress_phase(auth, args.sessions, args.turns, args.shared_user, rng)
+    report["db_mb"] = round(os.path.getsize(os.environ["DATABASE_PATH"]) / 2**20, 2)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if not report["stress"]["correct"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
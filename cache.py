@@ -0,0 +1,250 @@
+import hashlib
+import os
+import threading
+import time
+
+from db import db
+from metrics import incr
+
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRANSCRIPT_TTL_SECONDS = int(os.getenv("TRANSCRIPT_TTL_SECONDS", str(7 * 24 * 3600)))
+PDF_PAGE_CACHE_MAX_BYTES = int(os.getenv("PDF_PAGE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+# =========================
+# CACHE KEYS
+# =========================
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts):
+    return ":".join(str(p) for p in parts)
+
+
+# =========================
+# SUMMARY CACHE (SQLITE, LRU)
+# =========================
+class SummaryCache:
+    def __init__(self, database=db, max_bytes=SUMMARY_CACHE_MAX_BYTES):
+        self.db = database
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        row = self.db.fetchone("SELECT summary FROM summary_cache WHERE key=?", (key,))
+        if row is None:
+            self._count(False)
+            incr("cache.requests", cache="summary", result="miss")
+            return None
+
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE summary_cache SET hits = hits + 1, last_used=? WHERE key=?",
+                (time.time(), key)
+            )
+        self._count(True)
+        incr("cache.requests", cache="summary", result="hit")
+        return row[0]
+
+    def put(self, key, summary):
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO summary_cache (key, summary, size, hits, created_at, last_used)
+                VALUES (?, ?, ?, 0, ?, ?)
+                """,
+                (key, summary, len(summary.encode("utf-8")), now, now)
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM summary_cache"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        stale = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM summary_cache ORDER BY last_used"
+        ).fetchall():
+            stale.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM summary_cache WHERE key=?", stale)
+
+    def stats(self):
+        entries, size = self.db.fetchone(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summary_cache"
+        )
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+# =========================
+# TRANSCRIPT STORE (SQLITE, TTL)
+# =========================
+class TranscriptStore:
+    def __init__(self, database=db, ttl=TRANSCRIPT_TTL_SECONDS):
+        self.db = database
+        self.ttl = ttl
+
+    def get(self, video_id, language_code=None):
+        # Returns (language_code, label, text) of the freshest unexpired
+        # transcript, optionally for one language only.
+        query = "SELECT language_code, label, text FROM transcripts WHERE video_id=? AND fetched_at>?"
+        params = [video_id, time.time() - self.ttl]
+        if language_code is not None:
+            query += " AND language_code=?"
+            params.append(language_code)
+        query += " ORDER BY fetched_at DESC LIMIT 1"
+
+        row = self.db.fetchone(query, params)
+        incr("cache.requests", cache="transcript", result="miss" if row is None else "hit")
+        return row
+
+    def put(self, video_id, language_code, label, text):
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO transcripts (video_id, language_code, label, text, fetched_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (video_id, language_code, label, text, now)
+            )
+            conn.execute(
+                "DELETE FROM transcripts WHERE fetched_at<=?", (now - self.ttl,)
+            )
+
+
+# =========================
+# CHAT ROLLING SUMMARIES
+# =========================
+class ChatSummaryStore:
+    def __init__(self, database=db):
+        self.db = database
+
+    def get(self, chat_id):
+        # Returns (last_id, summary): `summary` folds the chat's messages up to
+        # and including chats.id `last_id`.
+        return self.db.fetchone(
+            "SELECT last_id, summary FROM chat_summaries WHERE chat_id=?",
+            (chat_id,)
+        )
+
+    def put(self, chat_id, last_id, summary):
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO chat_summaries (chat_id, last_id, summary, updated_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (chat_id, last_id, summary, time.time())
+            )
+
+
+# =========================
+# PDF PAGE TEXT CACHE
+# =========================
+class PdfPageCache:
+    def __init__(self, database=db, max_bytes=PDF_PAGE_CACHE_MAX_BYTES):
+        self.db = database
+        self.max_bytes = max_bytes
+
+    def count(self, doc_hash):
+        return self.db.fetchone(
+            "SELECT COUNT(*) FROM pdf_pages WHERE doc_hash=?", (doc_hash,)
+        )[0]
+
+    def get_range(self, doc_hash, start, stop):
+        rows = self.db.fetchall(
+            "SELECT page_no, text FROM pdf_pages WHERE doc_hash=? AND page_no>=? AND page_no<?",
+            (doc_hash, start, stop)
+        )
+        incr("cache.requests", len(rows), cache="pdf_pages", result="hit")
+        incr("cache.requests", (stop - start) - len(rows), cache="pdf_pages", result="miss")
+        return dict(rows)
+
+    def put_many(self, doc_hash, pages):
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO pdf_pages (doc_hash, page_no, text, size, cached_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [(doc_hash, n, text, len(text.encode("utf-8")), now) for n, text in pages]
+            )
+            self._evict(conn, doc_hash)
+
+    def _evict(self, conn, keep):
+        # Whole documents go, least recently cached first, never the one
+        # being written.
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pdf_pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for doc_hash, size in conn.execute(
+            """
+            SELECT doc_hash, SUM(size) FROM pdf_pages
+            WHERE doc_hash<>?
+            GROUP BY doc_hash
+            ORDER BY MAX(cached_at)
+            """,
+            (keep,)
+        ).fetchall():
+            conn.execute("DELETE FROM pdf_pages WHERE doc_hash=?", (doc_hash,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+# =========================
+# SUMMARY CHECKPOINTS
+# =========================
+class SummaryCheckpoints:
+    def __init__(self, database=db, ttl=CHECKPOINT_TTL_SECONDS):
+        self.db = database
+        self.ttl = ttl
+
+    def get_level(self, key, level):
+        # {idx: summary} of the unexpired partials of one level.
+        rows = self.db.fetchall(
+            "SELECT idx, summary FROM summary_checkpoints WHERE key=? AND level=? AND created_at>?",
+            (key, level, time.time() - self.ttl)
+        )
+        return dict(rows)
+
+    def put(self, key, level, idx, summary):
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO summary_checkpoints (key, level, idx, summary, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, level, idx, summary, now)
+            )
+            conn.execute(
+                "DELETE FROM summary_checkpoints WHERE created_at<=?", (now - self.ttl,)
+            )
+
+
+summary_cache = SummaryCache()
+transcript_store = TranscriptStore()
+chat_summary_store = ChatSummaryStore()
+pdf_page_cache = PdfPageCache()
+summary_checkpoints = SummaryCheckpoints()
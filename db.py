@@ -0,0 +1,98 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from metrics import span
+from migrations import migrate
+
+DB_PATH = os.getenv("DATABASE_PATH", "database.db")
+DB_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DATABASE_BUSY_TIMEOUT_MS", "5000"))
+
+
+# =========================
+# CONNECTION POOL
+# =========================
+# Streamlit runs every session (and every rerun) on its own thread, so a
+# single shared connection/cursor lets concurrent users interleave their
+# statements. Instead each caller checks a connection out of a small pool,
+# uses it for one short operation and hands it back.
+#
+# Connections run in WAL mode: readers see a consistent snapshot and never
+# wait on a writer, and writers only queue behind each other (up to the busy
+# timeout) instead of failing with "database is locked".
+
+class Database:
+    def __init__(self, path=DB_PATH, pool_size=DB_POOL_SIZE, busy_timeout_ms=DB_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        # isolation_level=None: no implicit transactions, every write below
+        # opens its own explicit BEGIN IMMEDIATE ... COMMIT.
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                migrate(conn)
+                self._schema_ready = True
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
+        try:
+            self._ensure_schema(conn)
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run the block as one short write transaction."""
+        with span("db.transaction"), self.connection() as conn:
+            with span("db.begin"):
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            with span("db.commit"):
+                conn.commit()
+
+    def fetchone(self, sql, params=()):
+        with span("db.query"), self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with span("db.query"), self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+
+db = Database()
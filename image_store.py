@@ -0,0 +1,137 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import time
+
+from db import db
+from metrics import incr
+
+IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "generated_images")
+IMAGE_STORE_MAX_BYTES = int(os.getenv("IMAGE_STORE_MAX_BYTES", str(500 * 1024 * 1024)))
+
+# Chat messages reference stored images as "[image:<sha256>]" so history can
+# render them again after a reload.
+_IMAGE_REF = re.compile(r"\[image:([0-9a-f]{64})\]")
+
+
+def image_ref(image_id):
+    return f"[image:{image_id}]"
+
+
+def image_id_from_path(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def parse_image_ref(content):
+    match = _IMAGE_REF.search(content or "")
+    return match.group(1) if match else None
+
+
+def prompt_key(prompt, model):
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+# =========================
+# CONTENT-ADDRESSED IMAGE STORE
+# =========================
+class ImageStore:
+    def __init__(self, root=IMAGE_STORE_DIR, database=db, max_bytes=IMAGE_STORE_MAX_BYTES):
+        self.root = root
+        self.db = database
+        self.max_bytes = max_bytes
+
+    def path_for(self, image_id):
+        return os.path.join(self.root, image_id[:2], f"{image_id}.png")
+
+    def put(self, image):
+        """Store a PIL image (or PNG bytes) and return its image id."""
+        if isinstance(image, bytes):
+            data = image
+        else:
+            buf = io.BytesIO()
+            image.save(buf, format="PNG")
+            data = buf.getvalue()
+
+        image_id = hashlib.sha256(data).hexdigest()
+        path = self.path_for(image_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so a concurrent reader never sees half a file.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO images (image_id, size, created_at, last_used) VALUES (?, ?, ?, ?)
+                ON CONFLICT(image_id) DO UPDATE SET last_used = excluded.last_used
+                """,
+                (image_id, len(data), now, now)
+            )
+            evicted = self._evict(conn, keep=image_id)
+        self._remove_files(evicted)
+        return image_id
+
+    def get_path(self, image_id):
+        path = self.path_for(image_id)
+        if not os.path.exists(path):
+            return None
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE images SET last_used=? WHERE image_id=?", (time.time(), image_id))
+        return path
+
+    def remember_prompt(self, prompt, model, image_id):
+        with self.db.transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO image_prompts (prompt_hash, image_id, model, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (prompt_key(prompt, model), image_id, model, time.time())
+            )
+
+    def lookup_prompt(self, prompt, models):
+        """Return the image id of an earlier generation of `prompt`, if any."""
+        for model in models:
+            row = self.db.fetchone(
+                "SELECT image_id FROM image_prompts WHERE prompt_hash=?",
+                (prompt_key(prompt, model),)
+            )
+            if row is not None and os.path.exists(self.path_for(row[0])):
+                incr("cache.requests", cache="image_prompt", result="hit")
+                return row[0]
+        incr("cache.requests", cache="image_prompt", result="miss")
+        return None
+
+    def _evict(self, conn, keep):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return []
+
+        evicted = []
+        for image_id, size in conn.execute(
+            "SELECT image_id, size FROM images WHERE image_id<>? ORDER BY last_used", (keep,)
+        ).fetchall():
+            evicted.append(image_id)
+            total -= size
+            if total <= self.max_bytes:
+                break
+        conn.executemany("DELETE FROM images WHERE image_id=?", [(i,) for i in evicted])
+        conn.executemany("DELETE FROM image_prompts WHERE image_id=?", [(i,) for i in evicted])
+        return evicted
+
+    def _remove_files(self, image_ids):
+        for image_id in image_ids:
+            try:
+                os.remove(self.path_for(image_id))
+            except FileNotFoundError:
+                pass
+
+
+image_store = ImageStore()
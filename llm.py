@@ -0,0 +1,224 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from metrics import incr, observe
+
+# Client-side pacing to the account's Groq rate limits, per minute. 0 (the
+# default) turns a limit off and leaves it to Groq's 429s and the retries
+# below; on the free tier, GROQ_RPM=30 and GROQ_TPM=6000 avoid most of those.
+GROQ_RPM = float(os.getenv("GROQ_RPM", "0"))
+GROQ_TPM = float(os.getenv("GROQ_TPM", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "1.0"))
+LLM_BACKOFF_MAX_SECONDS = 30.0
+
+# Reserved per call for the reply, on top of the prompt, until the real usage
+# is known.
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("COMPLETION_TOKEN_ESTIMATE", "400"))
+
+# Share of each bucket that background work may not use, so an interactive
+# turn is admitted promptly even while a long summary is running.
+INTERACTIVE_RESERVE = 0.2
+
+# Background calls in flight at once, process-wide; interactive calls do not
+# count and never wait for a slot. This is what keeps chat turns ahead of
+# summaries when the buckets above are off. 0 removes the cap.
+LLM_BACKGROUND_CONCURRENCY = int(os.getenv("LLM_BACKGROUND_CONCURRENCY", "4"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+
+def is_retryable_error(err):
+    """429, 5xx, timeouts and dropped connections are worth retrying."""
+    status = getattr(err, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    name = type(err).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def _retry_after(err):
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# =========================
+# TOKEN BUCKET
+# =========================
+class TokenBucket:
+    """`capacity` units that refill continuously over one minute.
+
+    A capacity of 0 disables the limit."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, reserve=0.0):
+        # Seconds until `amount` can be taken while leaving `reserve` of the
+        # capacity untouched. A request larger than the whole bucket is let
+        # through once the bucket is full rather than never.
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        need = min(amount + reserve * self.capacity, self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / self.rate
+
+    def take(self, amount):
+        if self.capacity:
+            self._refill()
+            self.level -= amount
+
+    def give_back(self, amount):
+        if self.capacity:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+# =========================
+# LLM SCHEDULER
+# =========================
+class LLMScheduler:
+    """Process-wide admission control for LLM calls.
+
+    Callers queue by priority (then arrival). The head of the queue is
+    admitted once the requests- and tokens-per-minute buckets allow it and,
+    for background calls, a background slot is free, so interactive turns
+    overtake queued background chunk calls. Rate-limited and 5xx responses
+    are retried with exponential backoff and jitter, re-queuing each time.
+    """
+
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM, max_retries=LLM_MAX_RETRIES,
+                 backoff=LLM_BACKOFF_SECONDS, background_concurrency=LLM_BACKGROUND_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.background_concurrency = background_concurrency
+        self._background_running = 0
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._metrics = {
+            name: {"calls": 0, "queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0,
+                   "retries": 0, "rate_limited": 0, "errors": 0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _slot_free(self, priority):
+        return (
+            priority == PRIORITY_INTERACTIVE
+            or not self.background_concurrency
+            or self._background_running < self.background_concurrency
+        )
+
+    def _admit(self, priority, tokens):
+        reserve = INTERACTIVE_RESERVE if priority != PRIORITY_INTERACTIVE else 0.0
+        ticket = (priority, next(self._seq))
+        metrics = self._metrics[PRIORITY_NAMES[priority]]
+        start = time.monotonic()
+
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            metrics["queued"] += 1
+            try:
+                while True:
+                    if self._queue[0] == ticket and not self._slot_free(priority):
+                        # Woken by _release when a background call finishes.
+                        delay = None
+                    elif self._queue[0] == ticket:
+                        delay = max(
+                            self.requests.wait_time(1, reserve),
+                            self.tokens.wait_time(tokens, reserve),
+                        )
+                        if delay <= 0:
+                            break
+                    else:
+                        delay = None
+                    self._cond.wait(delay)
+
+                heapq.heappop(self._queue)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                if priority != PRIORITY_INTERACTIVE:
+                    self._background_running += 1
+            finally:
+                metrics["queued"] -= 1
+                self._cond.notify_all()
+
+            waited = time.monotonic() - start
+            metrics["calls"] += 1
+            metrics["wait_seconds"] += waited
+            metrics["max_wait_seconds"] = max(metrics["max_wait_seconds"], waited)
+        observe("llm.queue_wait", waited, priority=PRIORITY_NAMES[priority])
+
+    def _release(self, priority):
+        if priority != PRIORITY_INTERACTIVE:
+            with self._cond:
+                self._background_running -= 1
+                self._cond.notify_all()
+
+    def _count(self, metrics, *keys):
+        with self._cond:
+            for key in keys:
+                metrics[key] += 1
+
+    def call(self, fn, tokens, priority=PRIORITY_BACKGROUND):
+        """Run `fn()` once admitted for an estimated `tokens`; retry transient errors."""
+        metrics = self._metrics[PRIORITY_NAMES[priority]]
+        attempt = 0
+        while True:
+            self._admit(priority, tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    self._count(metrics, "errors")
+                    raise
+                if getattr(e, "status_code", None) == 429:
+                    self._count(metrics, "rate_limited")
+                self._count(metrics, "retries")
+                incr("llm.retries", priority=PRIORITY_NAMES[priority], status=getattr(e, "status_code", None))
+
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(LLM_BACKOFF_MAX_SECONDS, self.backoff * 2 ** attempt)
+                    delay *= 0.5 + random.random() / 2
+                attempt += 1
+            finally:
+                self._release(priority)
+            time.sleep(delay)
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known."""
+        with self._cond:
+            if actual < estimated:
+                self.tokens.give_back(estimated - actual)
+            else:
+                self.tokens.take(actual - estimated)
+            self._cond.notify_all()
+
+    def metrics(self):
+        with self._cond:
+            return {name: dict(values) for name, values in self._metrics.items()}
+
+
+scheduler = LLMScheduler()
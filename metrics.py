@@ -0,0 +1,362 @@
+import atexit
+import contextvars
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Comma-separated: "histogram" (in-process), "sqlite" (metrics table),
+# "prometheus" (histogram plus a /metrics text endpoint). Empty disables.
+METRICS_SINKS = os.getenv("METRICS_SINKS", "histogram")
+METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", os.getenv("DATABASE_PATH", "database.db"))
+METRICS_PROMETHEUS_PORT = int(os.getenv("METRICS_PROMETHEUS_PORT", "9464"))
+METRICS_FLUSH_BATCH = 200
+
+# Per-request breakdowns, one JSON line per request, to METRICS_PROFILE_PATH
+# (or stderr).
+METRICS_PROFILE = os.getenv("METRICS_PROFILE", "0") == "1"
+METRICS_PROFILE_PATH = os.getenv("METRICS_PROFILE_PATH")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# =========================
+# SINKS
+# =========================
+class HistogramSink:
+    """Keeps counters and latency histograms in memory, per name and labels."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._counters = {}
+
+    def observe(self, name, seconds, labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            series = self._timings.get(key)
+            if series is None:
+                series = self._timings[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+            series["count"] += 1
+            series["sum"] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+                    break
+
+    def incr(self, name, amount, labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timings": [
+                    {"name": name, "labels": dict(labels), "count": s["count"], "sum": s["sum"],
+                     "buckets": dict(zip(self.buckets, s["buckets"]))}
+                    for (name, labels), s in sorted(self._timings.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+            }
+
+    def render_prometheus(self, prefix="chatbot"):
+        def metric(name, suffix=""):
+            return f"{prefix}_{name.replace('.', '_')}{suffix}"
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"'.replace("\n", " ") for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            timings = sorted(self._timings.items())
+            counters = sorted(self._counters.items())
+
+        declared = set()
+        for (name, labels), s in timings:
+            base = metric(name, "_seconds")
+            if base not in declared:
+                lines.append(f"# TYPE {base} histogram")
+                declared.add(base)
+            cumulative = 0
+            for bound, n in zip(self.buckets, s["buckets"]):
+                cumulative += n
+                lines.append(f"{base}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{base}_bucket{fmt(labels, [('le', '+Inf')])} {s['count']}")
+            lines.append(f"{base}_sum{fmt(labels)} {s['sum']}")
+            lines.append(f"{base}_count{fmt(labels)} {s['count']}")
+        for (name, labels), value in counters:
+            base = metric(name, "_total")
+            if base not in declared:
+                lines.append(f"# TYPE {base} counter")
+                declared.add(base)
+            lines.append(f"{base}{fmt(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SQLiteSink:
+    """Appends raw events to a `metrics` table, in batches.
+
+    Uses its own connection rather than the app's pool, so writing metrics
+    never shows up as (or waits behind) an instrumented database operation.
+    """
+
+    def __init__(self, path=METRICS_DB_PATH, batch=METRICS_FLUSH_BATCH):
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._rows = []
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA busy_timeout = 5000")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            kind TEXT NOT NULL,
+            name TEXT NOT NULL,
+            labels TEXT NOT NULL,
+            value REAL NOT NULL
+        )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_metrics_name_ts ON metrics (name, ts)")
+        atexit.register(self.flush)
+
+    def _add(self, kind, name, value, labels):
+        with self._lock:
+            self._rows.append((time.time(), kind, name, json.dumps(dict(_label_key(labels))), value))
+            if len(self._rows) >= self.batch:
+                self._flush_locked()
+
+    def observe(self, name, seconds, labels):
+        self._add("timing", name, seconds, labels)
+
+    def incr(self, name, amount, labels):
+        self._add("counter", name, amount, labels)
+
+    def _flush_locked(self):
+        rows, self._rows = self._rows, []
+        try:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT INTO metrics (ts, kind, name, labels, value) VALUES (?, ?, ?, ?, ?)", rows
+                )
+        except sqlite3.Error:
+            # Metrics are best effort; never fail the request over them.
+            pass
+
+    def flush(self):
+        with self._lock:
+            if self._rows:
+                self._flush_locked()
+
+
+def serve_prometheus(sink, port=METRICS_PROMETHEUS_PORT):
+    """Serve `sink` in Prometheus text format on http://0.0.0.0:<port>/metrics."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = sink.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# =========================
+# RECORDING
+# =========================
+sinks = []
+histogram = None
+_profile = contextvars.ContextVar("metrics_profile", default=None)
+
+
+def add_sink(sink):
+    sinks.append(sink)
+
+
+def observe(name, seconds, **labels):
+    for sink in sinks:
+        sink.observe(name, seconds, labels)
+    profile = _profile.get()
+    if profile is not None:
+        profile.add("spans", name, seconds)
+
+
+def incr(name, amount=1, **labels):
+    if not amount:
+        return
+    for sink in sinks:
+        sink.incr(name, amount, labels)
+    profile = _profile.get()
+    if profile is not None:
+        profile.add("counters", name, amount)
+
+
+@contextmanager
+def span(name, **labels):
+    """Time the block as `name`; a failing block is recorded with error="1"."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(name, time.perf_counter() - start, error="1", **labels)
+        raise
+    observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of `span`."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timed_iter(name, iterable, **labels):
+    """Yield from `iterable`, recording the time spent producing items (not
+    consuming them) as one `name` observation and the item count as
+    `<name>.items`."""
+    iterator = iter(iterable)
+    spent, count = 0.0, 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                spent += time.perf_counter() - start
+                break
+            spent += time.perf_counter() - start
+            count += 1
+            yield item
+    finally:
+        observe(name, spent, **labels)
+        incr(f"{name}.items", count, **labels)
+
+
+# =========================
+# PER-REQUEST PROFILES
+# =========================
+class Profile:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+
+    def add(self, kind, name, value):
+        # Called from worker threads too (see copy_context in utils).
+        with self._lock:
+            if kind == "spans":
+                entry = self.spans.setdefault(name, {"count": 0, "seconds": 0.0})
+                entry["count"] += 1
+                entry["seconds"] += value
+            else:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        with self._lock:
+            return {
+                "request": self.name,
+                "labels": self.labels,
+                "seconds": round(time.perf_counter() - self.start, 4),
+                "spans": {
+                    k: {"count": v["count"], "seconds": round(v["seconds"], 4)}
+                    for k, v in sorted(self.spans.items(), key=lambda kv: -kv[1]["seconds"])
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+
+def start_profile(name, **labels):
+    """Begin collecting a breakdown for the current request, if profiling is on.
+
+    Returns a handle for `finish_profile`, or None.
+    """
+    if not METRICS_PROFILE:
+        return None
+    profile = Profile(name, labels)
+    _profile.set(profile)
+    return profile
+
+
+def finish_profile(profile):
+    if profile is None:
+        return None
+    if _profile.get() is profile:
+        _profile.set(None)
+    report = profile.report()
+    line = json.dumps(report, ensure_ascii=False)
+    if METRICS_PROFILE_PATH:
+        with open(METRICS_PROFILE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    else:
+        print(line, file=sys.stderr)
+    return report
+
+
+@contextmanager
+def profiled(name, **labels):
+    profile = start_profile(name, **labels)
+    try:
+        yield profile
+    finally:
+        finish_profile(profile)
+
+
+def snapshot():
+    return histogram.snapshot() if histogram is not None else {"timings": [], "counters": []}
+
+
+def render_prometheus():
+    return histogram.render_prometheus() if histogram is not None else ""
+
+
+def _configure(names):
+    global histogram
+    names = {n.strip() for n in names.split(",") if n.strip()}
+    if names & {"histogram", "prometheus"}:
+        histogram = HistogramSink()
+        add_sink(histogram)
+    if "sqlite" in names:
+        add_sink(SQLiteSink())
+    if "prometheus" in names:
+        try:
+            serve_prometheus(histogram)
+        except OSError:
+            # Another process (e.g. a second Streamlit worker) has the port.
+            pass
+
+
+_configure(METRICS_SINKS)
@@ -0,0 +1,387 @@
+import sqlite3
+import sys
+
+
+# =========================
+# SCHEMA MIGRATIONS
+# =========================
+# Each entry upgrades the schema by one version. The current version lives in
+# PRAGMA user_version, so an existing database.db is brought up to date in
+# place on startup and already-applied steps are never rerun. Only ever append
+# to this list.
+
+def _base_tables(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chats (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        chat_id TEXT,
+        role TEXT,
+        content TEXT
+    )
+    """)
+
+
+def _conversations(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS conversations (
+        chat_id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        title TEXT NOT NULL DEFAULT 'New Chat',
+        updated_at REAL NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_conversations_user_updated
+    ON conversations (username, updated_at DESC)
+    """)
+
+    # Backfill for databases created before the index existed. Older chats
+    # get updated_at=0 and are inserted oldest first, so rowid keeps their
+    # relative order in the sidebar.
+    if cur.execute("SELECT 1 FROM conversations LIMIT 1").fetchone() is None:
+        cur.execute("""
+        INSERT INTO conversations (chat_id, username, title, updated_at, message_count)
+        SELECT
+            c.chat_id,
+            c.username,
+            COALESCE(
+                (SELECT substr(u.content, 1, 30) FROM chats u
+                 WHERE u.chat_id = c.chat_id AND u.role = 'user'
+                 ORDER BY u.id LIMIT 1),
+                'New Chat'
+            ),
+            0,
+            COUNT(*)
+        FROM chats c
+        WHERE c.chat_id IS NOT NULL
+        GROUP BY c.chat_id
+        ORDER BY MAX(c.id)
+        """)
+
+
+def _chat_indexes(cur):
+    # load_chats: WHERE username=? ORDER BY id
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_username_id ON chats (username, id)")
+    # load_messages / delete_chat: WHERE chat_id=? [AND id<?] ORDER BY id
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_chat_id_id ON chats (chat_id, id)")
+
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(chats)")]
+    if "created_at" not in columns:
+        cur.execute("ALTER TABLE chats ADD COLUMN created_at REAL")
+
+
+def _document_index(cur):
+    # Uploaded PDFs, chunked and indexed for retrieval (see retrieval.py).
+    # Documents are shared by content hash; chat_documents attaches them to
+    # the chats they were uploaded in.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS documents (
+        doc_hash TEXT PRIMARY KEY,
+        name TEXT,
+        chunk_count INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS doc_chunks USING fts5(
+        content,
+        doc_hash UNINDEXED,
+        chunk_no UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_documents (
+        chat_id TEXT NOT NULL,
+        doc_hash TEXT NOT NULL,
+        attached_at REAL NOT NULL,
+        PRIMARY KEY (chat_id, doc_hash)
+    )
+    """)
+
+
+def _chat_search(cur):
+    # Full-text index over chats.content for history search. It is an
+    # external-content table (no second copy of the text), kept in sync with
+    # chats by triggers, so every insert/delete path updates it. username is
+    # indexed too so a search can be narrowed to one user inside FTS.
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS chats_fts USING fts5(
+        username,
+        content,
+        content = 'chats',
+        content_rowid = 'id',
+        tokenize = 'porter unicode61'
+    )
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS chats_fts_insert AFTER INSERT ON chats BEGIN
+        INSERT INTO chats_fts (rowid, username, content)
+        VALUES (new.id, new.username, new.content);
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS chats_fts_delete AFTER DELETE ON chats BEGIN
+        INSERT INTO chats_fts (chats_fts, rowid, username, content)
+        VALUES ('delete', old.id, old.username, old.content);
+    END
+    """)
+
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS chats_fts_update AFTER UPDATE ON chats BEGIN
+        INSERT INTO chats_fts (chats_fts, rowid, username, content)
+        VALUES ('delete', old.id, old.username, old.content);
+        INSERT INTO chats_fts (rowid, username, content)
+        VALUES (new.id, new.username, new.content);
+    END
+    """)
+
+    cur.execute("INSERT INTO chats_fts (chats_fts) VALUES ('rebuild')")
+
+
+def _tool_caches(cur):
+    # Tables behind cache.py and image_store.py, created with the rest of the
+    # schema on the process's first connection rather than when those modules
+    # are imported.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS summary_cache (
+        key TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_summary_cache_last_used ON summary_cache (last_used)")
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS transcripts (
+        video_id TEXT NOT NULL,
+        language_code TEXT NOT NULL,
+        label TEXT NOT NULL,
+        text TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        PRIMARY KEY (video_id, language_code)
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS chat_summaries (
+        chat_id TEXT PRIMARY KEY,
+        covered INTEGER NOT NULL,
+        prefix_hash TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS pdf_pages (
+        doc_hash TEXT NOT NULL,
+        page_no INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        cached_at REAL NOT NULL,
+        PRIMARY KEY (doc_hash, page_no)
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS images (
+        image_id TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS image_prompts (
+        prompt_hash TEXT PRIMARY KEY,
+        image_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_image_prompts_image ON image_prompts (image_id)")
+
+
+def _summary_checkpoints(cur):
+    # Partial summaries of a long source, one row per map chunk (level 0) or
+    # reduce group (level 1+), so an interrupted summary resumes from where
+    # it stopped instead of starting over.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS summary_checkpoints (
+        key TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        idx INTEGER NOT NULL,
+        summary TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (key, level, idx)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_summary_checkpoints_created ON summary_checkpoints (created_at)")
+
+
+def _chat_summaries_by_id(cur):
+    # Rolling chat summaries used to record how many messages they covered,
+    # counted within whatever slice of the chat the caller loaded; they now
+    # record the chats.id of the last folded message. The old rows cannot be
+    # converted and are rebuilt on the chat's next reply.
+    cur.execute("DROP TABLE IF EXISTS chat_summaries")
+    cur.execute("""
+    CREATE TABLE chat_summaries (
+        chat_id TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL,
+        summary TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+
+
+def _api_tables(cur):
+    # Sessions and job status behind api.py, shared by all its workers.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS api_sessions (
+        token TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS api_jobs (
+        job_id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+
+
+def _doc_chunks_by_document(cur):
+    # doc_hash becomes an indexed column, so a search can be narrowed to one
+    # chat's documents inside the MATCH instead of ranking every document's
+    # chunks and filtering afterwards.
+    cur.execute("""
+    CREATE VIRTUAL TABLE doc_chunks_new USING fts5(
+        content,
+        doc_hash,
+        chunk_no UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """)
+    cur.execute("""
+    INSERT INTO doc_chunks_new (rowid, content, doc_hash, chunk_no)
+    SELECT rowid, content, doc_hash, chunk_no FROM doc_chunks
+    """)
+    cur.execute("DROP TABLE doc_chunks")
+    cur.execute("ALTER TABLE doc_chunks_new RENAME TO doc_chunks")
+
+
+MIGRATIONS = [
+    _base_tables,
+    _conversations,
+    _chat_indexes,
+    _document_index,
+    _chat_search,
+    _tool_caches,
+    _summary_checkpoints,
+    _chat_summaries_by_id,
+    _api_tables,
+    _doc_chunks_by_document,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """Apply every pending migration, one transaction per version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    while version < SCHEMA_VERSION:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock.
+            version = cur.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                MIGRATIONS[version](cur)
+                version += 1
+                cur.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return version
+
+
+# =========================
+# QUERY PLAN CHECK
+# =========================
+HOT_QUERIES = {
+    "load_chats": ("SELECT chat_id, role, content FROM chats WHERE username=? ORDER BY id", ("u",)),
+    "load_messages": ("SELECT id, role, content FROM chats WHERE chat_id=? AND id<? ORDER BY id DESC LIMIT ?", ("c", 1, 1)),
+    "delete_chat": ("DELETE FROM chats WHERE chat_id=?", ("c",)),
+    "list_conversations": (
+        "SELECT chat_id, title, updated_at, message_count FROM conversations "
+        "WHERE username=? ORDER BY updated_at DESC, rowid DESC LIMIT ? OFFSET ?",
+        ("u", 1, 0),
+    ),
+    "login_user": ("SELECT username FROM users WHERE username=? AND password=?", ("u", "p")),
+    # search_chats: the MATCH must be the outer loop, each hit joined by rowid.
+    "search_chats": (
+        "SELECT c.chat_id, chats_fts.rank FROM chats_fts CROSS JOIN chats c ON c.id = chats_fts.rowid "
+        "WHERE chats_fts MATCH ? AND c.username = ?",
+        ('username:"u" AND content:("x"*)', "u"),
+    ),
+}
+
+
+def check_query_plans(conn):
+    """Return {query_name: [plan details]} and the names that scan a table.
+
+    A full-text MATCH shows up as a scan of the virtual table and is fine.
+    """
+    plans, scans = {}, []
+    for name, (sql, params) in HOT_QUERIES.items():
+        details = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        plans[name] = details
+        if any(d.startswith("SCAN") and "USING" not in d and "VIRTUAL TABLE" not in d for d in details):
+            scans.append(name)
+    return plans, scans
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else "database.db")
+    print(f"schema version: {migrate(conn)}")
+
+    plans, scans = check_query_plans(conn)
+    for name, details in plans.items():
+        print(f"{name}:")
+        for detail in details:
+            print(f"    {detail}")
+
+    if scans:
+        print(f"full table scans: {', '.join(scans)}")
+        sys.exit(1)
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+
+MODEL_FAILURE_THRESHOLD = int(os.getenv("MODEL_FAILURE_THRESHOLD", "3"))
+MODEL_COOLDOWN_SECONDS = float(os.getenv("MODEL_COOLDOWN_SECONDS", "60"))
+MODEL_UNAVAILABLE_COOLDOWN_SECONDS = float(os.getenv("MODEL_UNAVAILABLE_COOLDOWN_SECONDS", "3600"))
+LATENCY_SMOOTHING = 0.3
+
+
+def is_unavailable_error(err):
+    """True for errors that mean "this model is not served here" (404, gated,
+    auth), as opposed to transient ones (timeouts, 429, 5xx)."""
+    status = getattr(err, "status_code", None)
+    if status is None:
+        status = getattr(getattr(err, "response", None), "status_code", None)
+    if status in (401, 403, 404):
+        return True
+
+    text = str(err)
+    return (
+        "404" in text
+        or "Not Found" in text
+        or "gated" in text.lower()
+        or "must be authenticated" in text.lower()
+    )
+
+
+# =========================
+# MODEL HEALTH REGISTRY
+# =========================
+class ModelHealth:
+    """Process-wide circuit breaker and latency tracker for model endpoints.
+
+    A model that answers "not available" is skipped for a long cooldown; one
+    that fails `failure_threshold` times in a row is skipped for a short one.
+    After the cooldown the next call is let through as a probe. Latency is an
+    exponentially weighted moving average of successful calls.
+    """
+
+    def __init__(self, failure_threshold=MODEL_FAILURE_THRESHOLD,
+                 cooldown=MODEL_COOLDOWN_SECONDS,
+                 unavailable_cooldown=MODEL_UNAVAILABLE_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.unavailable_cooldown = unavailable_cooldown
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _state(self, model):
+        return self._models.setdefault(model, {
+            "successes": 0,
+            "failures": 0,
+            "consecutive_failures": 0,
+            "open_until": 0.0,
+            "latency": None,
+            "last_error": None,
+        })
+
+    def order(self, models):
+        """Candidates to try, in preference order, skipping open circuits.
+
+        If every circuit is open the full list is returned, so a request
+        still gets a chance instead of failing without a call.
+        """
+        now = time.time()
+        with self._lock:
+            available = [m for m in models if self._state(m)["open_until"] <= now]
+        return available or list(models)
+
+    def latency(self, model):
+        with self._lock:
+            return self._state(model)["latency"]
+
+    def record_success(self, model, latency):
+        with self._lock:
+            state = self._state(model)
+            state["successes"] += 1
+            state["consecutive_failures"] = 0
+            state["open_until"] = 0.0
+            if state["latency"] is None:
+                state["latency"] = latency
+            else:
+                state["latency"] += LATENCY_SMOOTHING * (latency - state["latency"])
+
+    def record_failure(self, model, err):
+        with self._lock:
+            state = self._state(model)
+            state["failures"] += 1
+            state["consecutive_failures"] += 1
+            state["last_error"] = str(err)[:200]
+            if is_unavailable_error(err):
+                state["open_until"] = time.time() + self.unavailable_cooldown
+            elif state["consecutive_failures"] >= self.failure_threshold:
+                state["open_until"] = time.time() + self.cooldown
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {
+                model: dict(state, available=state["open_until"] <= now)
+                for model, state in self._models.items()
+            }
+
+
+model_health = ModelHealth()
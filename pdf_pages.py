@@ -0,0 +1,87 @@
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+# Kept free of the app's other imports: worker processes are spawned fresh
+# and import only this module.
+
+PDF_PROCESS_MIN_PAGES = int(os.getenv("PDF_PROCESS_MIN_PAGES", "64"))
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGE_BATCH = 8
+
+
+# =========================
+# WORKER SIDE
+# =========================
+_worker_reader = None
+
+
+def _init_worker(data):
+    # Each worker parses the file once; tasks then only carry page numbers.
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(data))
+
+
+def _extract(reader, page_numbers):
+    return [(n, reader.pages[n].extract_text() or "") for n in page_numbers]
+
+
+def _extract_in_worker(page_numbers):
+    return _extract(_worker_reader, page_numbers)
+
+
+# =========================
+# PAGE STREAM
+# =========================
+def iter_pages(data, doc_hash=None, page_cache=None):
+    """Yield the text of each page of a PDF, in order, as it becomes ready.
+
+    Pages already in `page_cache` under `doc_hash` are not re-extracted, and
+    newly extracted ones are added to it. Large files are extracted by a
+    process pool, a few batches ahead of the consumer, so only a bounded
+    window of pages is ever held in memory.
+    """
+    reader = PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    use_cache = page_cache is not None and doc_hash is not None
+
+    uncached = total - (page_cache.count(doc_hash) if use_cache else 0)
+    pool = None
+    if PDF_PROCESS_WORKERS > 1 and uncached >= PDF_PROCESS_MIN_PAGES:
+        pool = ProcessPoolExecutor(
+            max_workers=PDF_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(data,),
+        )
+    window = PDF_PROCESS_WORKERS * 2 if pool else 1
+
+    def start(pages):
+        cached = page_cache.get_range(doc_hash, pages.start, pages.stop) if use_cache else {}
+        missing = [n for n in pages if n not in cached]
+        if missing and pool is not None:
+            return cached, pool.submit(_extract_in_worker, missing)
+        return cached, missing
+
+    def finish(cached, job):
+        extracted = _extract(reader, job) if isinstance(job, list) else job.result()
+        if extracted and use_cache:
+            page_cache.put_many(doc_hash, extracted)
+        cached.update(extracted)
+        return [cached[n] for n in sorted(cached)]
+
+    try:
+        pending = deque()
+        for begin in range(0, total, PDF_PAGE_BATCH):
+            pending.append(start(range(begin, min(begin + PDF_PAGE_BATCH, total))))
+            if len(pending) >= window:
+                yield from finish(*pending.popleft())
+        while pending:
+            yield from finish(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,91 @@
+import re
+import time
+
+from db import db
+
+RETRIEVAL_TOP_K = 4
+
+# FTS5 treats bare words as AND-ed terms and gives punctuation special meaning.
+# Questions are turned into an OR of quoted terms and ranked by BM25 instead.
+_WORD = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "how", "i", "in", "is", "it", "me", "of", "on", "or", "that", "the",
+    "this", "to", "was", "what", "when", "where", "which", "who", "why", "with",
+    "you", "about", "tell", "please", "explain",
+}
+
+
+def _match_query(question):
+    terms = []
+    for word in _WORD.findall(question.lower()):
+        if word not in _STOPWORDS and word not in terms:
+            terms.append(word)
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+# =========================
+# DOCUMENT INDEX (SQLITE FTS5)
+# =========================
+class DocumentIndex:
+    def __init__(self, database=db):
+        self.db = database
+
+    def has_document(self, doc_hash):
+        return self.db.fetchone(
+            "SELECT 1 FROM documents WHERE doc_hash=?", (doc_hash,)
+        ) is not None
+
+    def add_document(self, doc_hash, name, chunks):
+        with self.db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM documents WHERE doc_hash=?", (doc_hash,)).fetchone():
+                return
+            count = 0
+            for count, chunk in enumerate(chunks, start=1):
+                conn.execute(
+                    "INSERT INTO doc_chunks (content, doc_hash, chunk_no) VALUES (?, ?, ?)",
+                    (chunk, doc_hash, count)
+                )
+            conn.execute(
+                "INSERT INTO documents (doc_hash, name, chunk_count, created_at) VALUES (?, ?, ?, ?)",
+                (doc_hash, name, count, time.time())
+            )
+
+    def attach(self, chat_id, doc_hash):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO chat_documents (chat_id, doc_hash, attached_at) VALUES (?, ?, ?)",
+                (chat_id, doc_hash, time.time())
+            )
+
+    def has_documents(self, chat_id):
+        return self.db.fetchone(
+            "SELECT 1 FROM chat_documents WHERE chat_id=? LIMIT 1", (chat_id,)
+        ) is not None
+
+    def search(self, chat_id, question, k=RETRIEVAL_TOP_K):
+        """Return [(document name, chunk text)] for the best-matching chunks."""
+        terms = _match_query(question)
+        if not terms:
+            return []
+        hashes = self.db.fetchall("SELECT doc_hash FROM chat_documents WHERE chat_id=?", (chat_id,))
+        if not hashes:
+            return []
+
+        # Only the chat's own documents are searched and ranked; the doc_hash
+        # column gets no weight in the score.
+        documents = " OR ".join(f'"{doc_hash}"' for doc_hash, in hashes)
+        return self.db.fetchall(
+            """
+            SELECT documents.name, doc_chunks.content
+            FROM doc_chunks
+            CROSS JOIN documents ON documents.doc_hash = doc_chunks.doc_hash
+            WHERE doc_chunks MATCH ?
+            ORDER BY bm25(doc_chunks, 1.0, 0.0)
+            LIMIT ?
+            """,
+            (f"doc_hash:({documents}) AND content:({terms})", k)
+        )
+
+
+document_index = DocumentIndex()
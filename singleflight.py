@@ -0,0 +1,109 @@
+import contextvars
+import threading
+
+from metrics import incr
+
+
+# =========================
+# IN-FLIGHT REQUEST COALESCING
+# =========================
+class _Flight:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pieces = []
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one job per key at a time; concurrent duplicates share it.
+
+    `do` is for plain calls: the first caller runs `fn`, later callers with
+    the same key wait for its result (or exception). `stream` is for
+    generators: the job runs on its own thread and every caller, the first
+    included, replays its pieces as they arrive, so one session leaving
+    early never cuts the stream short for the others. Keys are released as
+    soon as the job finishes; later callers start a new job (which normally
+    hits a cache).
+
+    This coalesces within one process. Separate worker processes still share
+    the summary cache and checkpoints through the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                incr("singleflight.shared", kind=str(key).split(":")[0])
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def _finish(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            flight.result = result
+            flight.error = error
+            flight.done = True
+            flight.cond.notify_all()
+
+    def do(self, key, fn):
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(key, flight, error=e)
+                raise
+            self._finish(key, flight, result=result)
+            return result
+
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _produce(self, key, flight, make_stream):
+        try:
+            for piece in make_stream():
+                with flight.cond:
+                    flight.pieces.append(piece)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            return
+        self._finish(key, flight)
+
+    def stream(self, key, make_stream):
+        flight, leader = self._join(key)
+        if leader:
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._produce, key, flight, make_stream),
+                name="singleflight",
+                daemon=True,
+            ).start()
+
+        seen = 0
+        while True:
+            with flight.cond:
+                flight.cond.wait_for(lambda: flight.done or len(flight.pieces) > seen)
+                pieces = flight.pieces[seen:]
+                done, error = flight.done, flight.error
+            yield from pieces
+            seen += len(pieces)
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+inflight = SingleFlight()
@@ -0,0 +1,59 @@
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import auth
+
+
+@pytest.fixture
+def client():
+    client = TestClient(api.app)
+    username = f"api-{uuid.uuid4().hex[:8]}"
+    client.post("/signup", json={"username": username, "password": "pw"})
+    token = client.post("/login", json={"username": username, "password": "pw"}).json()["token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+def finished(client, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_failed_summary_fails_the_job_and_is_not_saved(client, monkeypatch):
+    monkeypatch.setattr(api, "summarize_youtube", lambda url, language: "⚠️ Transcripts are disabled for this video.")
+    chat_id = f"chat-{uuid.uuid4().hex}"
+
+    response = client.post("/summaries/youtube", json={"url": "https://youtu.be/dQw4w9WgXcQ", "chat_id": chat_id})
+    job = finished(client, response.json()["job_id"])
+
+    assert job["status"] == "failed"
+    assert job["result"] is None
+    assert job["error"] == "⚠️ Transcripts are disabled for this video."
+    assert auth.load_messages(chat_id) == ([], None)
+
+
+def test_summary_is_saved_to_the_chat(client, monkeypatch):
+    monkeypatch.setattr(api, "summarize_youtube", lambda url, language: "A talk about owls.")
+    chat_id = f"chat-{uuid.uuid4().hex}"
+
+    response = client.post("/summaries/youtube", json={"url": "https://youtu.be/dQw4w9WgXcQ", "chat_id": chat_id})
+    job = finished(client, response.json()["job_id"])
+
+    assert (job["status"], job["result"]) == ("done", "A talk about owls.")
+    assert auth.load_messages(chat_id)[0] == [
+        {"role": "assistant", "content": "YouTube Summary:\nA talk about owls."}
+    ]
+
+
+def test_invalid_youtube_url_is_rejected(client):
+    response = client.post("/summaries/youtube", json={"url": "https://example.com/not-a-video"})
+    assert response.status_code == 422
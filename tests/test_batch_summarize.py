@@ -0,0 +1,20 @@
+from batch_summarize import collect_inputs, output_name
+
+
+def test_same_named_pdfs_in_different_folders_get_different_outputs(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "report.pdf").write_bytes(b"%PDF-1.4")
+
+    items, unknown = collect_inputs([str(tmp_path)])
+    names = {output_name(kind, source, "English") for kind, source in items}
+
+    assert unknown == []
+    assert len(items) == 2
+    assert len(names) == 2
+    assert all(name.startswith("report-") and name.endswith("-english.md") for name in names)
+
+
+def test_output_name_is_stable_across_runs():
+    assert output_name("pdf", "docs/report.pdf", "Telugu") == output_name("pdf", "./docs/report.pdf", "Telugu")
+    assert output_name("youtube", "https://youtu.be/dQw4w9WgXcQ", "English") == "youtube-dQw4w9WgXcQ-english.md"
@@ -0,0 +1,70 @@
+import uuid
+
+import auth
+import utils
+
+SYSTEM = {"role": "system", "content": "You are a helpful, friendly AI assistant."}
+
+
+def new_chat():
+    return f"chat-{uuid.uuid4().hex}"
+
+
+def test_saved_tool_output_is_kept_and_the_question_sent_once():
+    # The app's session holds the YouTube summary and the question, both saved.
+    chat_id = auth.save_chat("u", None, "assistant", "YouTube Summary:\nA talk about owls.")
+    auth.save_chat("u", chat_id, "user", "what was the video about?")
+    session = [
+        SYSTEM,
+        {"role": "assistant", "content": "📺 **YouTube Summary:**\n\nA talk about owls."},
+        {"role": "user", "content": "what was the video about?"},
+    ]
+
+    assert utils.build_context(session, chat_id) == [
+        SYSTEM,
+        {"role": "assistant", "content": "YouTube Summary:\nA talk about owls."},
+        {"role": "user", "content": "what was the video about?"},
+    ]
+
+
+def test_turns_saved_elsewhere_do_not_shift_the_unsaved_ones():
+    # A session message that is not in this chat must not make the saved
+    # question look unsaved and be sent twice.
+    chat_id = auth.save_chat("u", None, "user", "what was the video about?")
+    session = [
+        SYSTEM,
+        {"role": "assistant", "content": "📺 **YouTube Summary:**\n\nA talk about owls."},
+        {"role": "user", "content": "what was the video about?"},
+    ]
+
+    assert utils.build_context(session, chat_id) == [
+        SYSTEM,
+        {"role": "user", "content": "what was the video about?"},
+    ]
+
+
+def test_turns_marked_unsaved_follow_the_saved_ones():
+    chat_id = new_chat()
+    auth.save_chat("u", chat_id, "user", "hello")
+    session = [
+        SYSTEM,
+        {"role": "user", "content": "hello"},
+        {"role": "user", "content": "draft", "saved": False},
+    ]
+
+    assert [m["content"] for m in utils.build_context(session, chat_id)[1:]] == ["hello", "draft"]
+
+
+def test_unsaved_chat_uses_the_given_turns():
+    session = [SYSTEM, {"role": "user", "content": "hi"}]
+    assert utils.build_context(session, new_chat()) == session
+
+
+def test_delete_chat_removes_its_summary():
+    chat_id = auth.save_chat("u", None, "user", "hello")
+    auth.flush_chats(chat_id=chat_id)
+    utils.chat_summary_store.put(chat_id, 1, "the user said hello")
+
+    auth.delete_chat(chat_id)
+
+    assert utils.chat_summary_store.get(chat_id) is None
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+import pytest
+
+import auth
+from db import Database
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "db", Database(str(tmp_path / "chats.db")))
+    writer = auth.ChatWriter(interval=0.01)
+    monkeypatch.setattr(auth, "_chat_writer", writer)
+    yield writer
+    writer.close()
+
+
+def saved(chat_id):
+    return [content for _, _, content in auth.db.fetchall(
+        "SELECT id, role, content FROM chats WHERE chat_id=? ORDER BY id", (chat_id,)
+    )]
+
+
+def fail_on(monkeypatch, error, content=None):
+    write = auth._write_messages
+
+    def failing(conn, rows):
+        if content is None or any(row[3] == content for row in rows):
+            raise error
+        write(conn, rows)
+
+    monkeypatch.setattr(auth, "_write_messages", failing)
+
+
+def test_queued_messages_are_written_on_flush(writer):
+    for i in range(5):
+        auth.save_chat("u", "c", "user", f"m{i}")
+    assert auth.flush_chats(chat_id="c")
+    assert saved("c") == [f"m{i}" for i in range(5)]
+
+
+def test_bad_row_is_rejected_and_the_rest_written(writer, monkeypatch):
+    fail_on(monkeypatch, sqlite3.IntegrityError("bad row"), content="bad")
+    for content in ("a", "bad", "b"):
+        auth.save_chat("u", "c", "user", content)
+
+    assert auth.flush_chats(chat_id="c", timeout=5)
+    assert saved("c") == ["a", "b"]
+    assert [row[3] for row in writer.rejected] == ["bad"]
+
+
+def test_flush_gives_up_while_the_database_is_unavailable(writer, monkeypatch):
+    write = auth._write_messages
+    fail_on(monkeypatch, sqlite3.OperationalError("database is locked"))
+    auth.save_chat("u", "c", "user", "waiting")
+
+    start = time.perf_counter()
+    assert not auth.flush_chats(chat_id="c", timeout=0.2)
+    assert time.perf_counter() - start < 2
+
+    # Nothing is dropped: the batch is written once the database recovers.
+    monkeypatch.setattr(auth, "_write_messages", write)
+    assert auth.flush_chats(chat_id="c", timeout=10)
+    assert saved("c") == ["waiting"]
+    assert not writer.rejected
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from utils import chunk_text, count_tokens
+
+WORDS = "the model summary page section result data system user report value process".split()
+
+
+def make_text(paragraphs=200, seed=0):
+    rng = random.Random(seed)
+    return "\n\n".join(
+        ". ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20)))
+            for _ in range(rng.randint(1, 8))
+        ) + "."
+        for _ in range(paragraphs)
+    )
+
+
+def squash(text):
+    return "".join(text.split())
+
+
+@pytest.mark.parametrize("max_tokens", [20, 300, 2500])
+def test_chunks_fit_the_budget(max_tokens):
+    text = make_text() + "\n\n" + "తెలుగు వాక్యం. " * 200 + "\n\n" + "x" * 3000 + " " + "ab " * 2000
+    chunks = list(chunk_text(text, max_tokens, overlap_tokens=0))
+    assert max(count_tokens(c) for c in chunks) <= max_tokens
+    assert squash("".join(chunks)) == squash(text)
+
+
+def test_pages_are_chunked_like_the_joined_text():
+    pages = [make_text(20, seed=s) for s in range(5)]
+    joined = list(chunk_text("\n\n".join(pages), 300, overlap_tokens=0))
+    assert list(chunk_text(iter(pages), 300, overlap_tokens=0)) == joined
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    # One long paragraph, so the units are sentences well under the overlap.
+    rng = random.Random(1)
+    text = " ".join(" ".join(rng.choice(WORDS) for _ in range(8)) + "." for _ in range(500))
+    chunks = list(chunk_text(text, 300, overlap_tokens=50))
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        first_sentence = chunk.split(". ")[0] + "."
+        assert previous.endswith(first_sentence) or f" {first_sentence} " in previous
+
+
+def test_overlap_is_capped_at_half_the_budget():
+    text = make_text()
+    capped = list(chunk_text(text, 300, overlap_tokens=150))
+    assert list(chunk_text(text, 300, overlap_tokens=400)) == capped
+    assert len(capped) < 3 * len(list(chunk_text(text, 300, overlap_tokens=0)))
+
+
+def test_empty_text_has_no_chunks():
+    assert list(chunk_text("", 300)) == []
+    assert list(chunk_text(["", "  \n\n "], 300)) == []
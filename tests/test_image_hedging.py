@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+import utils
+from model_health import ModelHealth
+
+
+class FakeClient:
+    def __init__(self, delays):
+        self.delays = delays
+        self.started = {}
+        self.lock = threading.Lock()
+
+    def text_to_image(self, prompt, model):
+        with self.lock:
+            self.started[model] = time.perf_counter()
+        time.sleep(self.delays[model])
+        return f"image from {model}"
+
+
+@pytest.fixture
+def health(monkeypatch):
+    health = ModelHealth()
+    monkeypatch.setattr(utils, "model_health", health)
+    return health
+
+
+def test_no_hedge_before_a_latency_is_known(health):
+    client = FakeClient({"slow": 0.3, "fast": 0.0})
+    model, img, err = utils._run_image_candidates(client, "cat", ["slow", "fast"], hedge_after=None)
+    assert (model, img, err) == ("slow", "image from slow", None)
+    assert "fast" not in client.started
+    assert health.latency("slow") >= 0.3
+
+
+def test_hedge_after_twice_the_recorded_latency(health):
+    health.record_success("slow", 0.1)
+    client = FakeClient({"slow": 1.0, "fast": 0.0})
+    start = time.perf_counter()
+    model, img, err = utils._run_image_candidates(client, "cat", ["slow", "fast"], hedge_after=None)
+    assert (model, err) == ("fast", None)
+    assert 0.15 <= client.started["fast"] - start < 0.6
+
+
+def test_fixed_delay_overrides_and_zero_disables(health):
+    health.record_success("slow", 10.0)
+    client = FakeClient({"slow": 0.5, "fast": 0.0})
+    assert utils._run_image_candidates(client, "cat", ["slow", "fast"], hedge_after=0.05)[0] == "fast"
+
+    client = FakeClient({"slow": 0.2, "fast": 0.0})
+    health.record_success("slow", 0.01)
+    assert utils._run_image_candidates(client, "cat", ["slow", "fast"], hedge_after=0)[0] == "slow"
+    assert "fast" not in client.started
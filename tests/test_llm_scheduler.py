@@ -0,0 +1,80 @@
+import threading
+import time
+
+from llm import LLMScheduler, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+
+
+class Blocker:
+    """fn for scheduler.call that records it started and waits to be released."""
+
+    def __init__(self, name, started):
+        self.name = name
+        self.started = started
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.append(self.name)
+        self.release.wait(5)
+        return self.name
+
+
+def run(scheduler, fn, priority):
+    thread = threading.Thread(target=scheduler.call, args=(fn, 10, priority))
+    thread.start()
+    return thread
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.005)
+
+
+def test_interactive_calls_bypass_the_background_cap_without_rate_limits():
+    scheduler = LLMScheduler(rpm=0, tpm=0, background_concurrency=1)
+    started = []
+    first, second, chat = (Blocker(name, started) for name in ("first", "second", "chat"))
+
+    threads = [run(scheduler, first, PRIORITY_BACKGROUND)]
+    wait_for(lambda: started == ["first"])
+    threads.append(run(scheduler, second, PRIORITY_BACKGROUND))
+    threads.append(run(scheduler, chat, PRIORITY_INTERACTIVE))
+
+    wait_for(lambda: "chat" in started)
+    time.sleep(0.05)
+    assert "second" not in started
+
+    chat.release.set()
+    first.release.set()
+    wait_for(lambda: "second" in started)
+    second.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert scheduler._background_running == 0
+
+
+def test_failed_background_call_frees_its_slot():
+    scheduler = LLMScheduler(rpm=0, tpm=0, background_concurrency=1, max_retries=0)
+
+    def fail():
+        raise ValueError("bad request")
+
+    try:
+        scheduler.call(fail, 10, PRIORITY_BACKGROUND)
+    except ValueError:
+        pass
+    assert scheduler.call(lambda: "ok", 10, PRIORITY_BACKGROUND) == "ok"
+    assert scheduler.metrics()["background"]["errors"] == 1
+
+
+def test_zero_disables_the_background_cap():
+    scheduler = LLMScheduler(rpm=0, tpm=0, background_concurrency=0)
+    started = []
+    blockers = [Blocker(i, started) for i in range(3)]
+    threads = [run(scheduler, b, PRIORITY_BACKGROUND) for b in blockers]
+    wait_for(lambda: len(started) == 3)
+    for b in blockers:
+        b.release.set()
+    for thread in threads:
+        thread.join(5)
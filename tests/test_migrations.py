@@ -0,0 +1,97 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from migrations import SCHEMA_VERSION, check_query_plans, migrate
+
+BASELINE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database.db")
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    conn = sqlite3.connect(tmp_path / "fresh.db", isolation_level=None)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    # A copy: the committed database.db must never be migrated in place.
+    path = tmp_path / "baseline.db"
+    shutil.copy(BASELINE_DB, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    yield conn
+    conn.close()
+
+
+def user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_fresh_database_reaches_current_version(fresh_db):
+    assert migrate(fresh_db) == SCHEMA_VERSION
+    assert user_version(fresh_db) == SCHEMA_VERSION
+
+
+def test_baseline_database_reaches_current_version(baseline_db):
+    assert user_version(baseline_db) == 0
+    assert migrate(baseline_db) == SCHEMA_VERSION
+    assert user_version(baseline_db) == SCHEMA_VERSION
+
+
+def test_migrate_is_idempotent(baseline_db):
+    migrate(baseline_db)
+    before = baseline_db.execute("SELECT COUNT(*) FROM conversations").fetchone()
+    assert migrate(baseline_db) == SCHEMA_VERSION
+    assert baseline_db.execute("SELECT COUNT(*) FROM conversations").fetchone() == before
+
+
+def test_baseline_conversations_are_backfilled(baseline_db):
+    expected = baseline_db.execute(
+        "SELECT chat_id, username, COUNT(*) FROM chats WHERE chat_id IS NOT NULL GROUP BY chat_id"
+    ).fetchall()
+    assert expected
+
+    migrate(baseline_db)
+
+    rows = baseline_db.execute(
+        "SELECT chat_id, username, message_count FROM conversations"
+    ).fetchall()
+    assert sorted(rows) == sorted(expected)
+
+    for chat_id, title in baseline_db.execute("SELECT chat_id, title FROM conversations"):
+        first = baseline_db.execute(
+            "SELECT substr(content, 1, 30) FROM chats WHERE chat_id=? AND role='user' ORDER BY id LIMIT 1",
+            (chat_id,)
+        ).fetchone()
+        assert title == (first[0] if first else "New Chat")
+
+
+def test_baseline_messages_are_searchable(baseline_db):
+    migrate(baseline_db)
+    rowid, content = baseline_db.execute(
+        "SELECT id, content FROM chats WHERE content GLOB '*[A-Za-z]*' ORDER BY id LIMIT 1"
+    ).fetchone()
+    word = next(w for w in content.split() if w.isalpha())
+    hits = [r[0] for r in baseline_db.execute(
+        "SELECT rowid FROM chats_fts WHERE chats_fts MATCH ?", (f'content:("{word}")',)
+    )]
+    assert rowid in hits
+
+
+@pytest.mark.parametrize("db_fixture", ["fresh_db", "baseline_db"])
+def test_hot_queries_do_not_scan(db_fixture, request):
+    conn = request.getfixturevalue(db_fixture)
+    migrate(conn)
+    plans, scans = check_query_plans(conn)
+    assert scans == [], plans
+
+
+def test_search_matches_before_joining_chats(fresh_db):
+    migrate(fresh_db)
+    plans, _ = check_query_plans(fresh_db)
+    outer, inner = plans["search_chats"]
+    assert "chats_fts" in outer
+    assert "INTEGER PRIMARY KEY" in inner
@@ -0,0 +1,40 @@
+import pytest
+
+from db import Database
+from retrieval import DocumentIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DocumentIndex(Database(str(tmp_path / "docs.db")))
+    index.add_document("a" * 64, "gardening.pdf", [
+        "Tomatoes need full sun and regular watering.",
+        "Prune roses in late winter.",
+    ])
+    index.add_document("b" * 64, "astronomy.pdf", [
+        "Tomatoes are not found on Mars, but water ice is.",
+        "Jupiter is the largest planet.",
+    ])
+    index.attach("garden-chat", "a" * 64)
+    index.attach("space-chat", "b" * 64)
+    return index
+
+
+def test_search_only_returns_the_chats_documents(index):
+    assert index.search("garden-chat", "How much water do tomatoes need?") == [
+        ("gardening.pdf", "Tomatoes need full sun and regular watering."),
+    ]
+    assert [name for name, _ in index.search("space-chat", "tomatoes")] == ["astronomy.pdf"]
+
+
+def test_best_match_comes_first(index):
+    index.attach("both", "a" * 64)
+    index.attach("both", "b" * 64)
+    hits = index.search("both", "largest planet Jupiter")
+    assert hits[0] == ("astronomy.pdf", "Jupiter is the largest planet.")
+
+
+def test_no_hits_without_documents_or_terms(index):
+    assert index.search("other-chat", "tomatoes") == []
+    assert index.search("garden-chat", "what is the") == []
+    assert not index.has_documents("other-chat")
@@ -0,0 +1,37 @@
+import pytest
+
+import auth
+from db import Database
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "db", Database(str(tmp_path / "search.db")))
+    monkeypatch.setattr(auth, "_chat_writer", None)
+
+
+def test_search_only_returns_the_users_chats():
+    auth.save_chat("user5", "mine", "user", "How do I sort a list in python?")
+    for other in ("user50", "user5.x", "users"):
+        auth.save_chat(other, f"{other}-chat", "user", "python lists and sorting")
+
+    assert [r["chat_id"] for r in auth.search_chats("user5", "python sort")] == ["mine"]
+    assert [r["chat_id"] for r in auth.search_chats("user5.x", "pyth")] == ["user5.x-chat"]
+
+
+def test_best_chat_comes_first_with_a_snippet():
+    auth.save_chat("u", "a", "user", "a long message about the garden that mentions tomatoes only once")
+    auth.save_chat("u", "b", "user", "tomatoes need sun, tomatoes need water, tomatoes tomatoes")
+    auth.save_chat("u", "c", "user", "nothing relevant")
+
+    results = auth.search_chats("u", "tomato")
+    assert [r["chat_id"] for r in results] == ["b", "a"]
+    assert "**tomatoes**" in results[0]["snippet"]
+    assert [r["chat_id"] for r in auth.search_chats("u", "tomato", limit=1, offset=1)] == ["a"]
+
+
+def test_operators_are_searched_as_words():
+    auth.save_chat("u", "a", "user", "cats AND dogs")
+    assert [r["chat_id"] for r in auth.search_chats("u", 'dogs" OR "x')] == []
+    assert [r["chat_id"] for r in auth.search_chats("u", "cats AND")] == ["a"]
+    assert auth.search_chats("u", "  ") == []
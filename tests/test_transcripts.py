@@ -0,0 +1,34 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+import tools
+import utils
+
+
+class NoTranscriptFound(Exception):
+    pass
+
+
+def fake_youtube(language, is_generated):
+    transcript = SimpleNamespace(
+        language=language,
+        language_code="en",
+        is_generated=is_generated,
+        fetch=lambda: [{"text": "hello"}, {"text": "world"}],
+    )
+    transcripts = SimpleNamespace(find_transcript=lambda languages: transcript)
+    api = SimpleNamespace(list=lambda video_id: transcripts)
+    return SimpleNamespace(YouTubeTranscriptApi=lambda: api, NoTranscriptFound=NoTranscriptFound)
+
+
+@pytest.mark.parametrize("language, is_generated, label", [
+    ("English (auto-generated)", True, "English (auto-generated)"),
+    ("English", True, "English (Auto-generated)"),
+    ("English", False, "English"),
+])
+def test_generated_tracks_are_labelled_once(language, is_generated, label):
+    tools.override_tool("youtube", fake_youtube(language, is_generated))
+    text, got = utils.fetch_transcript(f"vid-{uuid.uuid4().hex[:8]}")
+    assert (text, got) == ("hello world", label)
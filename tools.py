@@ -0,0 +1,64 @@
+import threading
+import time
+
+# =========================
+# LAZY TOOL REGISTRY
+# =========================
+# Each tool (chat, YouTube, PDF, image) registers a loader that imports its
+# SDK and builds its client. Nothing is loaded until the tool is first used,
+# so starting a worker, logging in or chatting never pays for the other
+# tools' imports.
+
+_tools = {}
+_lock = threading.Lock()
+
+
+class Tool:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.value = None
+        self.loaded = False
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.loaded:
+            return self.value
+        with self._lock:
+            if not self.loaded:
+                start = time.perf_counter()
+                self.value = self.loader()
+                self.load_seconds = time.perf_counter() - start
+                self.loaded = True
+        return self.value
+
+
+def register_tool(name, loader):
+    with _lock:
+        _tools[name] = Tool(name, loader)
+
+
+def load_tool(name):
+    return _tools[name].get()
+
+
+def override_tool(name, value):
+    """Use `value` instead of loading the tool (benchmarks, tests)."""
+    tool = _tools[name]
+    with tool._lock:
+        tool.value = value
+        tool.loaded = True
+        tool.load_seconds = 0.0
+
+
+def load_all():
+    for tool in list(_tools.values()):
+        tool.get()
+
+
+def tool_status():
+    return {
+        name: {"loaded": tool.loaded, "load_seconds": tool.load_seconds}
+        for name, tool in _tools.items()
+    }
@@ -1,31 +1,113 @@
+import contextvars
 import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 load_dotenv()
 
-from groq import Groq
-from pypdf import PdfReader
-
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import VideoUnavailable, TranscriptsDisabled
-
-from huggingface_hub import InferenceClient
+from auth import messages_after
+from cache import summary_cache, transcript_store, chat_summary_store, pdf_page_cache, summary_checkpoints, hash_bytes, make_key
+from tools import register_tool, load_tool
+from singleflight import inflight
+from retrieval import document_index, RETRIEVAL_TOP_K
+from image_store import image_store
+from model_health import model_health
+from metrics import span, incr, timed_iter
+from llm import scheduler, COMPLETION_TOKEN_ESTIMATE, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
 
 
 # =========================
 # GROQ CLIENT
 # =========================
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# The SDKs behind each tool are imported on first use (see tools.py).
+# Assigning a client to groq_client substitutes it for the real one.
+groq_client = None
+GROQ_MODEL = "llama-3.1-8b-instant"
+
+# Optional comma-separated fallbacks, tried when GROQ_MODEL's circuit is open.
+GROQ_MODELS = [GROQ_MODEL] + [
+    m.strip() for m in os.getenv("GROQ_FALLBACK_MODELS", "").split(",") if m.strip()
+]
+
+
+def _load_groq():
+    from groq import Groq
+
+    # Retries are left to the shared scheduler, which also paces them.
+    return Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+
+
+register_tool("chat", _load_groq)
+
+
+def get_groq_client():
+    return groq_client if groq_client is not None else load_tool("chat")
+
+
+def _record_usage(model, usage):
+    if usage is None:
+        return
+    incr("groq.prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0, model=model)
+    incr("groq.completion_tokens", getattr(usage, "completion_tokens", 0) or 0, model=model)
+
+
+def _groq_request(model, messages, stream):
+    with span("groq.request", model=model, stream=stream):
+        return get_groq_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=stream
+        )
+
+
+def _groq_create(messages, stream=False, priority=PRIORITY_INTERACTIVE):
+    # Every Groq call goes through the shared model health registry: models
+    # with an open circuit are skipped, and latency/failures are recorded.
+    # The scheduler paces calls to the account's rate limits, retries 429/5xx
+    # and lets interactive calls go ahead of background ones.
+    estimate = sum(count_tokens(m["content"] or "") for m in messages) + COMPLETION_TOKEN_ESTIMATE
+    last_err = None
+    for model in model_health.order(GROQ_MODELS):
+        start = time.perf_counter()
+        try:
+            res = scheduler.call(
+                lambda: _groq_request(model, messages, stream),
+                estimate,
+                priority,
+            )
+        except Exception as e:
+            model_health.record_failure(model, e)
+            last_err = e
+            continue
+        # For streams this is the time to the response headers.
+        model_health.record_success(model, time.perf_counter() - start)
+        usage = getattr(res, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            scheduler.settle(estimate, usage.total_tokens)
+        _record_usage(model, usage)
+        return res
+    raise last_err
 
 
 # =========================
 # HF INFERENCE CLIENT
 # =========================
+def _load_hf():
+    from huggingface_hub import InferenceClient
+    return InferenceClient
+
+
+register_tool("image", _load_hf)
+
+
 def get_hf_client():
     token = os.getenv("HF_TOKEN")
     if not token:
         return None
 
+    InferenceClient = load_tool("image")
     # Force HF provider when supported
     try:
         return InferenceClient(provider="hf-inference", api_key=token)
@@ -37,8 +119,154 @@ def get_hf_client():
 # =========================
 # TEXT CHUNKING
 # =========================
-def chunk_text(text, max_chars=3500):
-    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+CHARS_PER_TOKEN = 4
+
+# Input tokens packed into one map-step prompt, per model. Large enough to
+# keep the call count low, small enough to stay well inside the context window
+# and leave room for the prompt and the partial summary.
+CHUNK_TOKENS = {
+    "llama-3.1-8b-instant": 2500,
+}
+DEFAULT_CHUNK_TOKENS = 1500
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+# Part of the checkpoint keys; bump it whenever chunk_text would cut the same
+# text differently, so stored partials are not matched to the wrong chunks.
+CHUNKING_VERSION = 2
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?।])\s+")
+
+
+def _char_counts(text):
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars, len(text) - ascii_chars
+
+
+def _tokens(ascii_chars, other_chars):
+    return (ascii_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + other_chars
+
+
+def count_tokens(text):
+    # Cheap approximation: ~4 ASCII characters per token, while non-ASCII
+    # scripts (e.g. Telugu) tokenize to roughly one token per character.
+    return _tokens(*_char_counts(text))
+
+
+def chunk_budget(model=GROQ_MODEL):
+    override = os.getenv("CHUNK_TOKENS")
+    if override:
+        return int(override)
+    return CHUNK_TOKENS.get(model, DEFAULT_CHUNK_TOKENS)
+
+
+def chunk_overlap(max_tokens, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    return max(0, min(overlap_tokens, max_tokens // 2))
+
+
+def _split_words(sentence, max_tokens):
+    # Character counts include the joining spaces, so every line measures at
+    # most max_tokens by count_tokens.
+    words, ascii_chars, other_chars = [], 0, 0
+    for word in sentence.split():
+        word_ascii, word_other = _char_counts(word)
+        if _tokens(word_ascii, word_other) > max_tokens:
+            if words:
+                yield " ".join(words)
+                words, ascii_chars, other_chars = [], 0, 0
+            step = max_tokens * CHARS_PER_TOKEN if word.isascii() else max_tokens
+            for i in range(0, len(word), step):
+                yield word[i:i + step]
+            continue
+        space = 1 if words else 0
+        if words and _tokens(ascii_chars + space + word_ascii, other_chars + word_other) > max_tokens:
+            yield " ".join(words)
+            words, ascii_chars, other_chars, space = [], 0, 0, 0
+        words.append(word)
+        ascii_chars += space + word_ascii
+        other_chars += word_other
+    if words:
+        yield " ".join(words)
+
+
+def _split_units(text, max_tokens):
+    # Yields (unit, starts_paragraph), preferring paragraph, then sentence,
+    # then word boundaries for anything larger than the budget.
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= max_tokens:
+            yield paragraph, True
+            continue
+
+        first = True
+        for sentence in _SENTENCE_BREAK.split(paragraph):
+            pieces = [sentence] if count_tokens(sentence) <= max_tokens else _split_words(sentence, max_tokens)
+            for piece in pieces:
+                yield piece, first
+                first = False
+
+
+def _separator(starts_paragraph):
+    return "\n\n" if starts_paragraph else " "
+
+
+def _join_units(units):
+    out = []
+    for i, (unit, _, _, starts_paragraph) in enumerate(units):
+        if i:
+            out.append(_separator(starts_paragraph))
+        out.append(unit)
+    return "".join(out)
+
+
+def _units_chars(units):
+    # Character counts of _join_units(units), separators included.
+    ascii_chars = sum(u[1] for u in units) + sum(len(_separator(u[3])) for u in units[1:])
+    return ascii_chars, sum(u[2] for u in units)
+
+
+def chunk_text(text, max_tokens=None, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Yield chunks of at most `max_tokens` tokens, as measured by count_tokens.
+
+    `text` may be a string or an iterable of strings such as PDF pages, which
+    are consumed lazily. Chunks break on paragraph or sentence boundaries where
+    possible, and the last `overlap_tokens` worth of units of each chunk are
+    repeated at the start of the next one. The overlap is capped at half of
+    `max_tokens`, so every chunk moves at least that far into the text.
+    """
+    if max_tokens is None:
+        max_tokens = chunk_budget()
+    overlap_tokens = chunk_overlap(max_tokens, overlap_tokens)
+    pieces = [text] if isinstance(text, str) else text
+
+    # current holds (unit, ascii chars, other chars, starts_paragraph).
+    current, ascii_chars, other_chars, fresh = [], 0, 0, False
+    for piece in pieces:
+        for unit, starts_paragraph in _split_units(piece, max_tokens):
+            unit_ascii, unit_other = _char_counts(unit)
+            sep = len(_separator(starts_paragraph)) if current else 0
+            if fresh and _tokens(ascii_chars + sep + unit_ascii, other_chars + unit_other) > max_tokens:
+                yield _join_units(current)
+
+                start = len(current)
+                while start > 0 and _tokens(*_units_chars(current[start - 1:])) <= overlap_tokens:
+                    start -= 1
+                tail = current[start:]
+                item = (unit, unit_ascii, unit_other, starts_paragraph)
+                while tail and _tokens(*_units_chars(tail + [item])) > max_tokens:
+                    tail.pop(0)
+                current, fresh = tail, False
+                ascii_chars, other_chars = _units_chars(current)
+                sep = len(_separator(starts_paragraph)) if current else 0
+
+            current.append((unit, unit_ascii, unit_other, starts_paragraph))
+            ascii_chars += sep + unit_ascii
+            other_chars += unit_other
+            fresh = True
+
+    if fresh:
+        yield _join_units(current)
 
 
 # =========================
@@ -58,51 +286,489 @@ def extract_video_id(url: str):
 
 
 # =========================
-# CHAT WITH LLM
+# CHAT CONTEXT
 # =========================
-def chat_with_llm(messages):
-    clean_messages = []
+# Prompt tokens allowed for the chat history, per model. The system prompt is
+# always sent; the newest turns fill the rest, and anything older is folded
+# into a rolling summary that is cached per chat_id and extended only with
+# the turns that fell out of the window since it was last updated. For a
+# saved chat the summary records the chats.id of the last folded message, and
+# everything after it is read back from the database, however little of the
+# chat the caller has loaded.
+CONTEXT_TOKENS = {
+    "llama-3.1-8b-instant": 4000,
+}
+DEFAULT_CONTEXT_TOKENS = 3000
+MAX_MESSAGE_TOKENS = 1200
+ROLLING_SUMMARY_TOKENS = 400
+
+FOLD_PROMPT = (
+    "Below is a running summary of an earlier conversation, followed by the "
+    "messages that came after it. Rewrite the summary so it covers all of it "
+    "in at most {limit} words. Keep names, facts, decisions and open questions. "
+    "Reply with the summary only.\n\n"
+    "Summary so far:\n{summary}\n\n"
+    "New messages:\n{messages}"
+)
+
+
+def context_budget(model=GROQ_MODEL):
+    return CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def _truncate_tokens(text, max_tokens):
+    if count_tokens(text) <= max_tokens:
+        return text
+    n = max_tokens * CHARS_PER_TOKEN
+    while n > 0 and count_tokens(text[:n]) > max_tokens:
+        n = n * 3 // 4
+    return text[:n] + " …[truncated]"
+
+
+def _fold_into_summary(summary, turns, budget):
+    # Folds `turns` into `summary` in as few calls as the budget allows.
+    batch, size = [], 0
+    for msg in turns + [None]:
+        line = None
+        if msg is not None:
+            line = f"{msg['role'].capitalize()}: {_truncate_tokens(msg['content'] or '', MAX_MESSAGE_TOKENS)}"
+        if batch and (line is None or size + count_tokens(line) > budget):
+            # The user is waiting on this fold for their reply.
+            summary = _complete(FOLD_PROMPT.format(
+                limit=ROLLING_SUMMARY_TOKENS * 3 // 4,
+                summary=summary or "(none yet)",
+                messages="\n".join(batch),
+            ), priority=PRIORITY_INTERACTIVE)
+            batch, size = [], 0
+        if line is not None:
+            batch.append(line)
+            size += count_tokens(line)
+    return summary
+
+
+def _fit_newest(turns, budget):
+    # Index of the oldest turn that still fits when filling newest-first.
+    # The latest turn is always kept.
+    start, used = len(turns), 0
+    for i in range(len(turns) - 1, -1, -1):
+        tokens = min(count_tokens(turns[i]["content"] or ""), MAX_MESSAGE_TOKENS)
+        if start < len(turns) and used + tokens > budget:
+            break
+        start, used = i, used + tokens
+    return start
+
+
+def _document_excerpts(chat_id, turns):
+    # Top-k chunks of the PDFs uploaded in this chat that match the latest
+    # question, so it can be answered without re-reading the whole document.
+    if not chat_id or not turns or turns[-1]["role"] != "user":
+        return ""
+    if not document_index.has_documents(chat_id):
+        return ""
+
+    hits = document_index.search(chat_id, turns[-1]["content"], k=RETRIEVAL_TOP_K)
+    if not hits:
+        return ""
+    parts = [f"[{name or 'document'}]\n{content}" for name, content in hits]
+    return (
+        "Relevant excerpts from documents the user uploaded. Use them to answer "
+        "if they are relevant, and say so if they do not contain the answer.\n\n"
+        + "\n\n---\n\n".join(parts)
+    )
 
-    for msg in messages[-10:]:
-        clean_messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
 
-    completion = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=clean_messages
+def _unfolded_turns(chat_id, turns):
+    # (summary, turns, ids) for a saved chat: the cached summary and the
+    # saved messages after it, read from the database, then the turns marked
+    # "saved": False. ids is None for those. A chat with nothing saved keeps
+    # `turns` and has no summary.
+    cached = chat_summary_store.get(chat_id)
+    last_id, summary = cached if cached is not None else (0, "")
+    saved, rows = messages_after(chat_id, last_id)
+    if not saved:
+        return "", turns, [None] * len(turns)
+
+    unsaved = [m for m in turns if m.get("saved") is False]
+    return (
+        summary,
+        [{"role": role, "content": content} for _, role, content in rows] + unsaved,
+        [row_id for row_id, _, _ in rows] + [None] * len(unsaved),
+    )
+
+
+def build_context(messages, chat_id=None, model=GROQ_MODEL):
+    """Return the messages to send for `messages`, within the model's budget.
+
+    With a `chat_id` of a saved chat, the conversation is read from the
+    database (the messages not yet folded into its summary), and of
+    `messages` only the system prompt and turns marked `"saved": False` are
+    used, after the saved ones.
+    """
+    system = [
+        {"role": m["role"], "content": m["content"]}
+        for m in messages if m["role"] == "system"
+    ]
+    turns = [
+        {"role": m["role"], "content": m["content"], "saved": m.get("saved")}
+        for m in messages if m["role"] != "system"
+    ]
+
+    summary, ids = "", [None] * len(turns)
+    if chat_id:
+        summary, turns, ids = _unfolded_turns(chat_id, turns)
+
+    excerpts = _document_excerpts(chat_id, turns)
+
+    budget = context_budget(model) - sum(count_tokens(m["content"]) for m in system)
+    window_budget = budget - ROLLING_SUMMARY_TOKENS - count_tokens(excerpts)
+
+    start = _fit_newest(turns, window_budget)
+    if start > 0:
+        # Out of room: fold down to half the window, so the next few turns fit
+        # without another summary call.
+        start = _fit_newest(turns, window_budget // 2)
+        summary = _fold_into_summary(summary, turns[:start], window_budget)
+        # Only a summary of saved messages can be resumed from its last id.
+        if chat_id and ids[start - 1] is not None:
+            chat_summary_store.put(chat_id, ids[start - 1], summary)
+        turns = turns[start:]
+
+    context = list(system)
+    if summary:
+        context.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary}"
+        })
+    if excerpts:
+        context.append({"role": "system", "content": excerpts})
+    context.extend(
+        {"role": m["role"], "content": _truncate_tokens(m["content"] or "", MAX_MESSAGE_TOKENS)}
+        for m in turns
     )
+    return context
+
+
+# =========================
+# CHAT WITH LLM
+# =========================
+def chat_with_llm(messages, chat_id=None):
+    with span("chat.build_context"):
+        context = build_context(messages, chat_id)
+    completion = _groq_create(context)
 
     return completion.choices[0].message.content
 
 
+def _stream_deltas(stream):
+    for chunk in stream:
+        # Groq reports usage on the last chunk of a stream.
+        x_groq = getattr(chunk, "x_groq", None)
+        if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+            _record_usage(getattr(chunk, "model", GROQ_MODEL), x_groq.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+def chat_with_llm_stream(messages, chat_id=None):
+    """Like `chat_with_llm`, but yields the reply piece by piece as it arrives."""
+    with span("chat.build_context"):
+        context = build_context(messages, chat_id)
+    stream = _groq_create(context, stream=True)
+    yield from _stream_deltas(stream)
+
+
+# =========================
+# MAP-REDUCE SUMMARIZATION
+# =========================
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "4"))
+REDUCE_MAX_TOKENS = 3000
+
+
+def _complete(prompt, priority=PRIORITY_BACKGROUND):
+    res = _groq_create([{"role": "user", "content": prompt}], priority=priority)
+    return res.choices[0].message.content
+
+
+def _stream_complete(prompt, priority=PRIORITY_INTERACTIVE):
+    stream = _groq_create([{"role": "user", "content": prompt}], stream=True, priority=priority)
+    yield from _stream_deltas(stream)
+
+
+def _bounded_map(pool, fn, items, window):
+    # Keeps at most `window` calls in flight and yields results in input order,
+    # so a long chunk iterator is never submitted all at once. Each call runs
+    # in a copy of the caller's context, so per-request profiles see it.
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(contextvars.copy_context().run, fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _group_for_reduce(parts, max_tokens):
+    groups, current, size = [], [], 0
+    for part in parts:
+        tokens = count_tokens(part)
+        if current and size + tokens > max_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(part)
+        size += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _checkpointed(key, level, fn):
+    # Wraps fn(item) to take (idx, item), reuse the stored partial for idx if
+    # there is one, and store each new partial as soon as it is made.
+    if key is None:
+        return lambda indexed: fn(indexed[1])
+
+    stored = summary_checkpoints.get_level(key, level)
+    incr("summary.checkpoint_hits", len(stored), level=level)
+
+    def run(indexed):
+        idx, item = indexed
+        if idx in stored:
+            return stored[idx]
+        result = fn(item)
+        summary_checkpoints.put(key, level, idx, result)
+        return result
+
+    return run
+
+
+def checkpoint_key(kind, source_id):
+    # Partials depend on the source, the model and how the text was chunked.
+    budget = chunk_budget()
+    return make_key("partials", kind, source_id, GROQ_MODEL, budget, chunk_overlap(budget), CHUNKING_VERSION)
+
+
+def source_digest(kind, source_id, make_chunks, map_prompt, reduce_prompt, sep="\n"):
+    """The reduced partials for one source, before any output language.
+
+    Stored per source in the summary cache, so summarizing the same source in
+    another language reuses them and costs only the final call; `make_chunks`
+    (which may fetch or extract the source) is not called at all then.
+    Requests for the same source in different languages at the same time
+    share one map phase.
+    """
+    partials = checkpoint_key(kind, source_id)
+    key = make_key("digest", partials)
+    digest = summary_cache.get(key)
+    if digest is None:
+        digest = inflight.do(key, lambda: _make_digest(key, partials, make_chunks, map_prompt, reduce_prompt, sep))
+    return digest
+
+
+def _make_digest(key, partials, make_chunks, map_prompt, reduce_prompt, sep):
+    # A caller that just missed the previous run finds its result here.
+    digest = summary_cache.get(key)
+    if digest is None:
+        digest = reduce_partials(make_chunks(), map_prompt, reduce_prompt, sep, checkpoint_key=partials)
+        if digest:
+            summary_cache.put(key, digest)
+    return digest
+
+
+# Summary output languages and how the final prompt asks for each.
+SUMMARY_LANGUAGES = {
+    "English": "SIMPLE, CLEAR ENGLISH",
+    "Telugu": "SIMPLE TELUGU. Use easy Telugu + English mix if needed",
+}
+
+# The summarizers report failures as text starting with one of these.
+FAILURE_PREFIXES = ("❌", "⚠️")
+
+
+def _language_prompt(output_language, instruction):
+    # Output language is applied only in the final call, which also translates
+    # partials written in the source's language, so it is always explicit.
+    return f"{instruction} in {SUMMARY_LANGUAGES[output_language]}:\n\n{{text}}"
+
+
+def reduce_partials(chunks, map_prompt, reduce_prompt, sep="\n",
+                    max_workers=SUMMARY_MAX_WORKERS, reduce_max_tokens=REDUCE_MAX_TOKENS,
+                    checkpoint_key=None):
+    """Summarize `chunks` concurrently and reduce the partials to fit one call.
+
+    Prompts are format strings with a single `{text}` field. Partial summaries
+    that do not fit in `reduce_max_tokens` are combined level by level with
+    `reduce_prompt`; the remaining partials are returned joined by `sep` ("" for
+    no chunks). All calls are scheduled as background work.
+
+    With a `checkpoint_key` (which must identify the chunks and the map and
+    reduce prompts), every partial is stored as it completes, and a rerun
+    after a failure only makes the calls that are still missing.
+    """
+    workers = max(1, max_workers)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partials = list(_bounded_map(
+            pool,
+            _checkpointed(checkpoint_key, 0, lambda chunk: _complete(map_prompt.format(text=chunk))),
+            enumerate(chunks),
+            workers * 2,
+        ))
+        incr("summary.chunks", len(partials))
+        level = 0
+
+        while len(partials) > 1 and count_tokens(sep.join(partials)) > reduce_max_tokens:
+            groups = _group_for_reduce(partials, reduce_max_tokens)
+            if len(groups) == len(partials):
+                # Every partial is already too large to pair up; stop here
+                # and let the final call take them as they are.
+                break
+            level += 1
+            partials = list(_bounded_map(
+                pool,
+                _checkpointed(
+                    checkpoint_key, level, lambda group: _complete(reduce_prompt.format(text=sep.join(group)))
+                ),
+                enumerate(groups),
+                workers * 2,
+            ))
+            incr("summary.reduce_calls", len(groups))
+
+    return sep.join(partials)
+
+
+def map_reduce_summarize(chunks, map_prompt, reduce_prompt, final_prompt,
+                         sep="\n", max_workers=SUMMARY_MAX_WORKERS,
+                         reduce_max_tokens=REDUCE_MAX_TOKENS, stream=False,
+                         checkpoint_key=None):
+    """`reduce_partials`, then one `final_prompt` call over what is left.
+
+    With `stream=True` the map and reduce levels still run to completion, and
+    the final call is returned as an iterator of text deltas. The final call,
+    which the user reads, is interactive.
+    """
+    text = reduce_partials(chunks, map_prompt, reduce_prompt, sep, max_workers,
+                           reduce_max_tokens, checkpoint_key)
+    return _final_summary(final_prompt.format(text=text), stream)
+
+
+def _final_summary(prompt, stream):
+    if stream:
+        return _stream_complete(prompt)
+    return _complete(prompt, priority=PRIORITY_INTERACTIVE)
+
 
 # =========================
 # PDF SUMMARY
 # =========================
-def summarize_pdf(pdf_file):
-    reader = PdfReader(pdf_file)
-    text = "".join((page.extract_text() or "") for page in reader.pages)
+def _file_bytes(pdf_file):
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    data = pdf_file.read()
+    pdf_file.seek(0)
+    return data
 
-    if not text.strip():
-        return "⚠️ Could not extract text from this PDF."
 
-    partial_summaries = []
-    for chunk in chunk_text(text):
-        prompt = f"Summarize this part of the PDF clearly:\n{chunk}"
-        res = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        partial_summaries.append(res.choices[0].message.content)
+def _load_pdf():
+    import pdf_pages
+    return pdf_pages
+
+
+register_tool("pdf", _load_pdf)
 
-    final_prompt = "Combine these into one clear summary:\n" + "\n".join(partial_summaries)
-    final_res = groq_client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[{"role": "user", "content": final_prompt}]
+
+def iter_pdf_pages(pdf_file, data=None):
+    # Page texts in order, streamed from the extractor and the page cache.
+    if data is None:
+        data = _file_bytes(pdf_file)
+    pages = load_tool("pdf").iter_pages(data, hash_bytes(data), pdf_page_cache)
+    return timed_iter("pdf.extract", pages)
+
+
+def _prepend(first, stream):
+    yield first
+    yield from stream
+
+
+def _cached_stream(key, stream):
+    parts = []
+    for piece in stream:
+        parts.append(piece)
+        yield piece
+    summary_cache.put(key, "".join(parts))
+
+
+def summarize_pdf_stream(pdf_file, output_language="English"):
+    if output_language not in SUMMARY_LANGUAGES:
+        yield f"❌ Unsupported summary language: {output_language}"
+        return
+
+    data = _file_bytes(pdf_file)
+    doc_hash = hash_bytes(data)
+    key = make_key("pdf", doc_hash, output_language, GROQ_MODEL)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    # Sessions summarizing the same document at the same time share one run.
+    yield from inflight.stream(key, lambda: _summarize_pdf(data, doc_hash, output_language, key))
+
+
+def _summarize_pdf(data, doc_hash, output_language, key):
+    # Pages are chunked and summarized as they are extracted; the whole
+    # document text is never held in memory at once.
+    digest = source_digest(
+        "pdf", doc_hash,
+        lambda: chunk_text(iter_pdf_pages(None, data)),
+        map_prompt="Summarize this part of the PDF clearly:\n{text}",
+        reduce_prompt="Combine these into one clear summary:\n{text}",
     )
-    return final_res.choices[0].message.content
+    if not digest:
+        yield "⚠️ Could not extract text from this PDF."
+        return
+
+    final_prompt = _language_prompt(output_language, "Combine these into one clear summary")
+    yield from _cached_stream(key, _final_summary(final_prompt.format(text=digest), stream=True))
+
+
+def summarize_pdf(pdf_file, output_language="English"):
+    return "".join(summarize_pdf_stream(pdf_file, output_language))
+
+
+# =========================
+# PDF QUESTION ANSWERING
+# =========================
+RETRIEVAL_CHUNK_TOKENS = 300
+RETRIEVAL_OVERLAP_TOKENS = 50
+
+
+def index_pdf(pdf_file, chat_id, name=None):
+    """Index a PDF locally and attach it to `chat_id` for retrieval in Chat.
+
+    Returns False when no text could be extracted. A document already indexed
+    by another chat is only attached, not re-read.
+    """
+    data = _file_bytes(pdf_file)
+    doc_hash = hash_bytes(data)
+    if not document_index.has_document(doc_hash):
+        # Chunked before the write transaction, so extraction never holds
+        # the database write lock.
+        chunks = list(chunk_text(
+            iter_pdf_pages(pdf_file, data),
+            max_tokens=RETRIEVAL_CHUNK_TOKENS,
+            overlap_tokens=RETRIEVAL_OVERLAP_TOKENS,
+        ))
+        if not chunks:
+            return False
+        document_index.add_document(doc_hash, name or getattr(pdf_file, "name", None), chunks)
+    document_index.attach(chat_id, doc_hash)
+    return True
 
 
 # =========================
@@ -120,110 +786,234 @@ def _transcript_items_to_text(items):
     return " ".join(parts)
 
 
-def summarize_youtube(url, output_language="English"):
-    video_id = extract_video_id(url)
-    if not video_id:
-        return "❌ Invalid YouTube URL"
+TRANSCRIPT_LANGUAGES = ["te", "en"]
 
-    try:
-        transcript = None
-        transcript_used = None
 
-        # Try Telugu first
+def _load_youtube():
+    import youtube_transcript_api
+    return youtube_transcript_api
+
+
+register_tool("youtube", _load_youtube)
+
+
+def _transcript_label(transcript):
+    # YouTube already names generated tracks "English (auto-generated)".
+    label = transcript.language
+    if transcript.is_generated and "auto-generated" not in label.lower():
+        label += " (Auto-generated)"
+    return label
+
+
+def fetch_transcript(video_id, languages=TRANSCRIPT_LANGUAGES):
+    stored = transcript_store.get(video_id)
+    if stored is not None:
+        _, label, text = stored
+        return text, label
+
+    # One listing call covers every language; manual transcripts win over
+    # auto-generated ones, then anything available is better than nothing.
+    yt = load_tool("youtube")
+    with span("youtube.transcript"):
+        transcript_list = yt.YouTubeTranscriptApi().list(video_id)
         try:
-            transcript = YouTubeTranscriptApi().fetch(video_id, ["te"])
-            transcript_used = "Telugu"
-        except Exception:
-            transcript = None
+            transcript = transcript_list.find_transcript(languages)
+        except yt.NoTranscriptFound:
+            available = list(transcript_list)
+            if not available:
+                raise
+            transcript = available[0]
 
-        # Fallback English
-        if transcript is None:
-            transcript = YouTubeTranscriptApi().fetch(video_id, ["en"])
-            transcript_used = "English (Auto/Available)"
+        text = _transcript_items_to_text(transcript.fetch())
+    label = _transcript_label(transcript)
 
-        text = _transcript_items_to_text(transcript)
+    if text.strip():
+        transcript_store.put(video_id, transcript.language_code, label, text)
+    return text, label
 
-        if not text.strip():
-            return "⚠️ Transcript is empty / not available."
 
-        summaries = []
-        for chunk in chunk_text(text):
-            res = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": f"Summarize this clearly:\n{chunk}"}]
-            )
-            summaries.append(res.choices[0].message.content)
+def summarize_youtube_stream(url, output_language="English"):
+    video_id = extract_video_id(url)
+    if not video_id:
+        yield "❌ Invalid YouTube URL"
+        return
+    if output_language not in SUMMARY_LANGUAGES:
+        yield f"❌ Unsupported summary language: {output_language}"
+        return
 
-        combined = " ".join(summaries)
+    key = make_key("youtube", video_id, output_language, GROQ_MODEL)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
 
-        if output_language == "Telugu":
-            final_prompt = (
-                "Give the final summary in SIMPLE TELUGU. "
-                "Use easy Telugu + English mix if needed:\n\n"
-                f"{combined}"
-            )
-        else:
-            final_prompt = "Give the final summary in SIMPLE, CLEAR ENGLISH:\n\n" + combined
+    # Sessions summarizing the same video in the same language at the same
+    # time share one run.
+    yield from inflight.stream(key, lambda: _summarize_youtube(video_id, output_language, key))
+
+
+def _summarize_youtube(video_id, output_language, key):
+    yt = load_tool("youtube")
+    try:
+        text, transcript_used = fetch_transcript(video_id)
 
-        final = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": final_prompt}]
+        if not text.strip():
+            yield "⚠️ Transcript is empty / not available."
+            return
+
+        # The transcript comes from the transcript store and the partials
+        # from the digest, so another language is a single call.
+        digest = source_digest(
+            "youtube", video_id,
+            lambda: chunk_text(text),
+            map_prompt="Summarize this clearly:\n{text}",
+            reduce_prompt="Combine these partial summaries into one clear summary:\n{text}",
+            sep=" ",
         )
+        final_prompt = _language_prompt(output_language, "Give the final summary")
+        summary = _final_summary(final_prompt.format(text=digest), stream=True)
 
-        return (
+        header = (
             f"### 📺 YouTube Video Summary\n\n"
             f"**Transcript Used:** {transcript_used}\n"
             f"**Summary Language:** {output_language}\n\n"
-            f"{final.choices[0].message.content}"
         )
+        yield from _cached_stream(key, _prepend(header, summary))
 
-    except TranscriptsDisabled:
-        return "⚠️ Transcripts are disabled for this video."
-    except VideoUnavailable:
-        return "⚠️ Video unavailable."
+    except yt.TranscriptsDisabled:
+        yield "⚠️ Transcripts are disabled for this video."
+    except yt.VideoUnavailable:
+        yield "⚠️ Video unavailable."
     except Exception as e:
-        return f"❌ Error: {str(e)}"
+        yield f"❌ Error: {str(e)}"
+
+
+def summarize_youtube(url, output_language="English"):
+    return "".join(summarize_youtube_stream(url, output_language))
 
 
 # =========================
 # IMAGE GENERATION (FIXED MODELS)
 # =========================
-def generate_image(prompt, output_path="generated_image.png"):
-    client = get_hf_client()
-    if client is None:
-        return "❌ HF_TOKEN not detected. Add HF_TOKEN to .env and restart Streamlit."
+# ✅ Pick models that are actually available on provider=hf-inference
+# (see: https://huggingface.co/models?inference_provider=hf-inference)
+IMAGE_MODELS = [
+    "stabilityai/stable-diffusion-xl-base-1.0",
+    "black-forest-labs/FLUX.1-schnell",
+    "ByteDance/SDXL-Lightning",
+]
+
+
+# Hedged mode: if the current model has not answered in time, also start the
+# next candidate and keep whichever finishes first. "In time" is
+# IMAGE_HEDGE_FACTOR x the model's smoothed latency (no hedging until it has
+# answered once); IMAGE_HEDGE_AFTER pins it in seconds, and 0 turns it off.
+IMAGE_HEDGE_FACTOR = float(os.getenv("IMAGE_HEDGE_FACTOR", "2"))
+IMAGE_HEDGE_AFTER = os.getenv("IMAGE_HEDGE_AFTER")
+IMAGE_HEDGE_AFTER = float(IMAGE_HEDGE_AFTER) if IMAGE_HEDGE_AFTER else None
+
+
+def _is_credits_error(err):
+    text = str(err)
+    return "402" in text or "Payment Required" in text or "credits" in text
+
+
+def _timed_text_to_image(client, prompt, model):
+    start = time.perf_counter()
+    with span("hf.text_to_image", model=model):
+        img = client.text_to_image(prompt, model=model)
+    return img, time.perf_counter() - start
+
+
+def _hedge_delay(model, hedge_after=IMAGE_HEDGE_AFTER):
+    if hedge_after is not None:
+        return hedge_after or None
+    latency = model_health.latency(model)
+    return IMAGE_HEDGE_FACTOR * latency if latency else None
 
-    # ✅ Pick models that are actually available on provider=hf-inference
-    # (see: https://huggingface.co/models?inference_provider=hf-inference)
-    model_candidates = [
-        "stabilityai/stable-diffusion-xl-base-1.0",
-        "black-forest-labs/FLUX.1-schnell",
-        "ByteDance/SDXL-Lightning",
-    ]
 
+def _run_image_candidates(client, prompt, models, hedge_after=IMAGE_HEDGE_AFTER):
+    """Return (model, image, None) for the first success, or (None, None, error)."""
+    remaining = list(models)
+    running = {}
     last_err = None
-    for model in model_candidates:
-        try:
-            img = client.text_to_image(prompt, model=model)
-            img.save(output_path)
-            return output_path
-        except Exception as e:
-            last_err = str(e)
-
-            # credits / paid / quota
-            if "402" in last_err or "Payment Required" in last_err or "credits" in last_err:
-                return (
-                    "❌ HF image generation hit credits/quota.\n\n"
-                    "This is controlled by Hugging Face Inference Providers.\n"
-                    "If your free credits are exhausted, you must wait for reset or add billing."
-                )
-
-            # if model not supported by hf-inference, try next
-            if "404" in last_err or "Not Found" in last_err:
-                continue
+    latest = None
+    pool = ThreadPoolExecutor(max_workers=max(1, len(remaining)))
+
+    def launch():
+        nonlocal latest
+        model = latest = remaining.pop(0)
+        running[pool.submit(
+            contextvars.copy_context().run, _timed_text_to_image, client, prompt, model
+        )] = model
 
-            # gated/private model
-            if "gated" in last_err.lower() or "must be authenticated" in last_err.lower():
+    try:
+        launch()
+        while running:
+            done, _ = wait(
+                running,
+                timeout=_hedge_delay(latest, hedge_after) if remaining else None,
+                return_when=FIRST_COMPLETED
+            )
+            if not done:
+                launch()
                 continue
 
-    return f"❌ Image generation failed on all models. Last error:\n{last_err or 'Unknown error'}"
\ No newline at end of file
+            for future in done:
+                model = running.pop(future)
+                try:
+                    img, latency = future.result()
+                except Exception as e:
+                    last_err = e
+                    model_health.record_failure(model, e)
+                    # credits / paid / quota: no other model will do better
+                    if _is_credits_error(e):
+                        return None, None, e
+                    if remaining and not running:
+                        launch()
+                    continue
+                model_health.record_success(model, latency)
+                return model, img, None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return None, None, last_err
+
+
+def generate_image(prompt):
+    """Return the stored image's path, or an error message."""
+    # Same prompt (and model) as before: serve it from disk, no HF call.
+    image_id = image_store.lookup_prompt(prompt, IMAGE_MODELS)
+    if image_id is not None:
+        path = image_store.get_path(image_id)
+        if path is not None:
+            return path
+
+    # A prompt already being generated (a double click, or the same prompt
+    # from two sessions) waits for that image instead of paying for another.
+    key = make_key("image", hash_bytes(prompt.encode("utf-8")))
+    return inflight.do(key, lambda: _generate_image(prompt))
+
+
+def _generate_image(prompt):
+    client = get_hf_client()
+    if client is None:
+        return "❌ HF_TOKEN not detected. Add HF_TOKEN to .env and restart Streamlit."
+
+    # Models that recently 404'd or were gated are skipped until their
+    # cooldown ends, instead of paying a failed round trip every time.
+    model, img, err = _run_image_candidates(client, prompt, model_health.order(IMAGE_MODELS))
+    if img is not None:
+        image_id = image_store.put(img)
+        image_store.remember_prompt(prompt, model, image_id)
+        return image_store.path_for(image_id)
+
+    if err is not None and _is_credits_error(err):
+        return (
+            "❌ HF image generation hit credits/quota.\n\n"
+            "This is controlled by Hugging Face Inference Providers.\n"
+            "If your free credits are exhausted, you must wait for reset or add billing."
+        )
+
+    last_err = str(err) if err is not None else None
+    return f"❌ Image generation failed on all models. Last error:\n{last_err or 'Unknown error'}"